@@ -23,22 +23,16 @@ def auth_api() -> str:
 
 # Функция получения данных с API
 def parse_data(token: str):
-    # Запросы для получения всех данных для построения GUI-интерфейса
+    # Последние записи сахаров, инсулина и устройств получаются одним запросом
     headers = {"Authorization": f"Bearer {token}"}
+    url = f"{cfg.API.url}/get/dashboard"
+    dashboard = requests.get(url=url, headers=headers).json()
 
-    # Получение последней записи сахаров
-    url = f"{cfg.API.url}/get/sugar/last"
-    sugar = requests.get(url=url, headers=headers).json()
+    # При ошибке API каждая часть получает текст ошибки (check_data сообщит о недостающих ключах)
+    if "detail" in dashboard:
+        return dashboard, dashboard, dashboard
 
-    # Получение последней записи инсулина и еды
-    url = f"{cfg.API.url}/get/insulin/last"
-    insulin = requests.get(url=url, headers=headers).json()
-
-    # Получение последней записи устройств
-    url = f"{cfg.API.url}/get/device/last"
-    device = requests.get(url=url, headers=headers).json()
-
-    return sugar, insulin, device
+    return dashboard['sugar'] or {}, dashboard['insulin'] or {}, dashboard['device'] or {}
 
 
 # Функция для проверки корректности данных из БД
@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt  # Библиотека для визуализации данных (Версия 3.8.1)
 import numpy as np  # Библиотека для анализа данных
+import msgpack  # Библиотека для чтения ответов в формате MessagePack
 import requests  # Библиотека для работы с HTTP запросами
 import config as cfg
 import datetime
@@ -33,24 +34,27 @@ def start_day(time_start: str, time_end: str):
         print("Ошибка получения токена")
         return False
 
-    # Получение данных сахаров
-    headers = {"Authorization": f"Bearer {token}"}
-    query_url = f"{cfg.API.url}/get/sugar/date/start={time_start}&end={time_end}"
-    data = requests.get(query_url, headers=headers).json()
-    if not data:
+    # Получение данных сахаров (колонки в MessagePack загружаются в NumPy без разбора по записям)
+    date_start = datetime.datetime.strptime(time_start, "%Y-%m-%d-%H-%M")
+    date_end = datetime.datetime.strptime(time_end, "%Y-%m-%d-%H-%M")
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/x-msgpack"}
+    query_url = f"{cfg.API.url}/get/sugar/date/start={int(date_start.timestamp())}&end={int(date_end.timestamp())}"
+    response = requests.get(query_url, headers=headers)
+    if response.status_code != 200:
+        print("Ошибка получения данных:", response.text)
+        return False
+    data = msgpack.unpackb(response.content, raw=False)
+    if not data['date']:
         print("Данные за данный временной промежуток отсутствуют")
         return False
 
     # Получение актуальной темы оформления графика
     theme = getattr(cfg.Graph.Themes, cfg.Graph.sel_theme)[0]
 
-    # Построение списка оси x | y
-    x = np.linspace(
-        start=datetime.datetime.strptime(time_start, "%Y-%m-%d-%H-%M").hour,
-        stop=datetime.datetime.strptime(time_end, "%Y-%m-%d-%H-%M").hour + 1,
-        num=len(data)
-    )
-    y = [float(data[item]['sugar']) for item in data]
+    # Построение списка оси x (часы от начала суток) | y (ммоль/л, в БД хранятся мг/дл)
+    dates = np.asarray(data['date'], dtype=np.int64)
+    x = date_start.hour + (dates - int(date_start.timestamp())) / 3600
+    y = np.asarray(data['value'], dtype=np.float64) / 18
 
     # Создание графика
     fig, ax = plt.subplots(figsize=(
@@ -102,10 +106,7 @@ def start_day(time_start: str, time_end: str):
     )
 
     # Установка пределов оси X
-    ax.set_xlim(
-        int(time_start.split('-')[3]),
-        int(time_end.split('-')[3]) + 1
-    )
+    ax.set_xlim(date_start.hour, date_end.hour + 1)
 
     # Убираем отступы
     ax.margins(x=0)
@@ -1,4 +1,7 @@
 from fastapi import FastAPI, HTTPException  # Библиотека для работы с FastAPI
+from fastapi import Response  # Класс ответа (заголовки страницы)
+from fastapi import Header  # Чтение заголовков запроса
+from fastapi.responses import StreamingResponse  # Класс потокового ответа
 from fastapi import Security  # Библиотека для улучшения безопасности сервера
 from fastapi.security import OAuth2PasswordBearer  # Библиотека для поддержки JWT-токенов
 from jose import JWTError, jwt  # Библиотека для работы с JWT ключами
@@ -6,7 +9,10 @@ from datetime import datetime, timedelta, UTC  # Библиотека для о
 from passlib.context import CryptContext  # Библиотека для поддержки hash-шифрования
 import uvicorn  # Библиотека для работы с локальным сервером
 from typing import Optional  # Библиотека для поддержки опциональных типов данных
+from contextlib import asynccontextmanager  # Библиотека для управления жизненным циклом приложения
 import json as js  # Библиотека для работы с JSON строками
+import asyncio  # Библиотека для параллельного выполнения корутин
+import time  # Библиотека для работы со временем
 import os  # Библиотека для работы с операционной системой
 
 # Библиотеки для работы Ограничителя запросов (прерывает общение с пользователем при > кол-во запросов)
@@ -17,9 +23,27 @@ from slowapi.middleware import SlowAPIMiddleware
 
 from database import database  # Модуль для взаимодействия с БД
 from database import struct  # Модуль с описанием структуры таблицы в БД
+from database import partitions  # Модуль для управления секциями таблиц
+from database import retention  # Модуль политики хранения и агрегатов
+from database import lookup  # Модуль кодов справочников
+from database import migrations  # Модуль со схемой таблиц
+from api import cache  # Модуль кэша последних записей
+from api import window  # Модуль окна последних данных в памяти
+from api import formats  # Модуль форматов ответа эндпоинтов периодов
 import config as cfg  # Настройки программы
 
 
+# Фоновые задачи API (цикл событий хранит задачи только по слабым ссылкам, без этого набора задача может быть удалена)
+BACKGROUND_TASKS = set()
+
+
+def background_done(task: asyncio.Task) -> None:
+    """Функция удаления завершенной фоновой задачи из BACKGROUND_TASKS с выводом ее ошибки"""
+    BACKGROUND_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Ошибка фоновой задачи {task.get_name()} - {task.exception()}")
+
+
 # Класс для управления безопасностью
 class JwtManager:
     def __init__(self, secret_key, algorithm, token_life, users_file_path):
@@ -134,6 +158,19 @@ class JwtManager:
             return {"Result": False, "Detail": "Could not validate credentials", "Code": 401}
 
 
+# Идемпотентная запись сахара: id выдает БД, повтор записи с той же датой обновляет строку
+UPSERT_SUGAR_QUERY = """
+INSERT INTO Sugar (date, value, tendency, difference) VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE value = VALUES(value), tendency = VALUES(tendency), difference = VALUES(difference)
+"""
+
+# Идемпотентная запись инсулина: уникальный ключ (date, type)
+UPSERT_INSULIN_QUERY = """
+INSERT INTO Insulin (date, value, carbs, duration, type) VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE value = VALUES(value), carbs = VALUES(carbs), duration = VALUES(duration)
+"""
+
+
 # Функция для генерации уникального идентификатора на основе числа
 def generate_new_id(old_id):
     """
@@ -210,8 +247,49 @@ def create_app():
         fastapi.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
         fastapi.add_middleware(SlowAPIMiddleware)
 
+    # Асинхронное подключение к БД (MySQL) для async-эндпоинтов со своим пулом соединений
+    adb = database.AsyncMySQL(
+        host=cfg.DataBase.host,
+        port=cfg.DataBase.port,
+        user=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.login"),
+        password=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.password"),
+        database=cfg.DataBase.database,
+        retry_delay=cfg.DataBase.retry_delay,
+        timeout=cfg.DataBase.timeout
+    )
+
+    # Функция запуска func в отдельном потоке фоновой задачей name (повторный запуск во время выполнения пропускается)
+    def run_background(name: str, func) -> None:
+        if any(task.get_name() == name and not task.done() for task in BACKGROUND_TASKS):
+            return
+        task = asyncio.create_task(asyncio.to_thread(func), name=name)
+        BACKGROUND_TASKS.add(task)
+        task.add_done_callback(background_done)
+
+    # Функция периодического обслуживания: будущие секции создаются раньше, чем данные дойдут до pmax,
+    # граница хранения исходных показаний перечитывается после политики хранения (python main.py --retention)
+    async def maintenance_loop(interval=3600):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(partitions.PartitionManager(db).maintain)
+                await asyncio.to_thread(aggregates.load_oldest)
+                if not hot.loaded():
+                    run_background("hot-load", hot.load)
+            except Exception as e:
+                print(f"⚠️ Ошибка обслуживания БД - {e}")
+
+    # Открытие и закрытие асинхронного пула вместе с приложением
+    @asynccontextmanager
+    async def lifespan(fastapi):
+        await adb.connect()
+        maintenance = asyncio.create_task(maintenance_loop())
+        yield
+        maintenance.cancel()
+        await adb.close()
+
     # Создание API приложения
-    app = FastAPI(title="Sugar Tracking API", version="1.0.0")
+    app = FastAPI(title="Sugar Tracking API", version="1.0.0", lifespan=lifespan)
 
     # Привязка ограничителя кол-во запросов
     add_limiter(app, redis_db=False)
@@ -230,6 +308,40 @@ def create_app():
         write_timeout=cfg.DataBase.write_timeout
     )
 
+    # API работает только с актуальной схемой (справочники, агрегаты и история устройств создаются миграциями)
+    version = migrations.Migrator(db).current_version()
+    if version < migrations.MIGRATIONS[-1]['version']:
+        message = (f"Схема БД {db.database} устарела (версия {version} из {migrations.MIGRATIONS[-1]['version']}), "
+                   f"выполните python main.py --migrate")
+        print(f"❌ {message}")
+        raise RuntimeError(message)
+
+    # Создание будущих помесячных секций (только для секционированных таблиц)
+    partitions.PartitionManager(db).maintain()
+
+    # Справочники строковых значений (в таблицах хранятся коды, в API передаются строки).
+    # Неизвестные коды дочитываются через асинхронное подключение (known_codes), не блокируя обработчики
+    codes = lookup.LookupCodes(db, reload=False)
+    codes.load()
+
+    # Колонки с кодами справочников {таблица: {индекс колонки: справочник}}
+    coded_columns = {
+        table: {migrations.COLUMNS[table].index(column): name for column, name in columns.items()}
+        for table, columns in migrations.ENCODED_COLUMNS.items()
+    }
+
+    # Кэш последних записей для /get/*/last (сбрасывается при записи соответствующей таблицы)
+    latest = cache.LatestCache()
+
+    # Агрегаты сахара пересчитываются при каждой записи показаний (при запуске - досчет пропущенных)
+    aggregates = retention.RetentionEngine(db)
+    aggregates.catch_up()
+    aggregates.load_oldest()
+
+    # Последние 14 дней сахара и инсулина в памяти (запросы по датам внутри окна не обращаются к БД)
+    hot = window.HotWindow(db)
+    hot.load()
+
     # Инициализация менеджера аутентификации
     auth = JwtManager(
         secret_key=cfg.API.token,
@@ -280,10 +392,18 @@ def create_app():
 
         # Генерация запроса и получение данных
         try:
-            result = db.execute_query(
+            result = await adb.execute_query(
                 query=data.query,
                 params=data.params
             )
+
+            # Произвольный запрос мог изменить данные, поэтому кэш и окно в памяти сбрасываются для всего, кроме SELECT.
+            # Окно сразу помечается незагруженным (запросы идут в БД) и перечитывается в отдельном потоке
+            if not data.query.lstrip().upper().startswith("SELECT"):
+                latest.invalidate()
+                hot.invalidate()
+                run_background("hot-load", hot.load)
+                run_background("oldest-raw", aggregates.load_oldest)
             return result
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
@@ -307,6 +427,17 @@ def create_app():
             password=data.password
         )
 
+    # Функция дочитывания справочников, если в строках есть коды, добавленные в БД в обход API
+    async def known_codes(rows, columns: dict) -> None:
+        """
+        :param rows: Строки таблицы
+        :param columns: {индекс колонки: справочник}
+        :return: None
+        """
+
+        if any(codes.missing(name, [row[index] for row in rows]) for index, name in columns.items()):
+            await codes.load_async(adb)
+
     # Функция получение записи в таблице Sugar по ID
     @app.get("/get/sugar/id/id={record_id}")
     async def get_glucose_by_id(record_id: int, token: str = Security(auth.oauth2_scheme)):
@@ -322,24 +453,177 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
+            result = await adb.execute_query(
                 query="SELECT * FROM Sugar WHERE id = %s",
                 params=(record_id, )
             )
+            await known_codes(result, coded_columns["Sugar"])
 
             return {
                 "id": result[0][0],
                 "date": result[0][1],
                 "value": result[0][2],
-                "tendency": result[0][3],
+                "tendency": codes.decode("Tendency", result[0][3]),
                 "difference": result[0][4]
             }
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
+    # Функция преобразования строки Sugar в JSON-объект
+    def sugar_json(item) -> dict:
+        return {
+            "id": item[0],
+            "date": item[1],
+            "value": item[2],
+            "tendency": codes.decode("Tendency", item[3]),
+            "difference": item[4]
+        }
+
+    # Функция преобразования строки Insulin в JSON-объект
+    def insulin_json(item) -> dict:
+        return {
+            "id": item[0],
+            "date": item[1],
+            "value": item[2],
+            "carbs": item[3],
+            "duration": item[4],
+            "type": codes.decode("EventType", item[5])
+        }
+
+    # Функция преобразования строк Sugar в колонки
+    def sugar_columns(rows: list) -> dict:
+        return formats.columns(
+            migrations.COLUMNS["Sugar"], rows, {"tendency": lambda code: codes.decode("Tendency", code)}
+        )
+
+    # Функция преобразования строк Insulin в колонки
+    def insulin_columns(rows: list) -> dict:
+        return formats.columns(
+            migrations.COLUMNS["Insulin"], rows, {"type": lambda code: codes.decode("EventType", code)}
+        )
+
+    # Функция преобразования строки агрегата сахара в JSON-объект (ключи date и value, как у исходных показаний)
+    def aggregate_json(table: str, item) -> dict:
+        return {
+            "date": item[0],
+            "value": item[1],
+            "min": item[2],
+            "max": item[3],
+            "count": item[4],
+            "time_in_range": round(item[5] / item[4] * 100, 1),
+            "resolution": retention.AGGREGATES[table]
+        }
+
+    # Функция чтения строк таблицы за период порциями в порядке (date, id) с курсором страницы
+    async def range_chunks(table: str, date_start: int, date_end: int, after=None, after_id=None, limit=None,
+                           stream=False):
+        """
+        :param table: Имя таблицы (Sugar | Insulin | Sugar_15m | Sugar_1h)
+        :param date_start: Начало периода (UNIX)
+        :param date_end: Конец периода (UNIX)
+        :param after: Дата последней строки предыдущей страницы
+        :param after_id: id последней строки предыдущей страницы (для агрегатов не используется)
+        :param limit: Кол-во строк на странице
+        :param stream: Читать серверным курсором (в памяти только одна порция)
+        :return: Асинхронный генератор порций строк
+        """
+
+        # Окно в памяти: страница выбирается по ключу без обращения к БД
+        if table in window.DTYPES:
+            columns = hot.range(table, date_start, date_end)
+            if columns is not None:
+                yield window.to_rows(table, window.keyset(columns, after, after_id, limit))
+                return
+
+            # Окно не загружено (сброс или неудачная загрузка) - перечитывается в фоне, запрос идет в БД
+            if not hot.loaded():
+                run_background("hot-load", hot.load)
+
+        key = "bucket" if table in retention.AGGREGATES else "date"
+        if key == "bucket":
+            select = f"SELECT bucket, mean, min, max, count, in_range FROM {table}"
+            order = "bucket"
+        else:
+            select = f"SELECT {', '.join(migrations.COLUMNS[table])} FROM {table}"
+            order = "date, id"
+
+        query = f"{select} WHERE {key} BETWEEN %s AND %s"
+        params = [date_start, date_end]
+        if after is not None and (after_id is None or key == "bucket"):
+            query += f" AND {key} > %s"
+            params.append(after)
+        elif after is not None:
+            query += " AND (date > %s OR (date = %s AND id > %s))"
+            params.extend([after, after, after_id])
+        query += f" ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        if stream:
+            async for rows in adb.stream_query(query=query, params=params):
+                yield rows
+        else:
+            yield await adb.execute_query(query=query, params=params)
+
+    # Функция преобразования строк агрегата сахара в колонки (ключи date и value, как у исходных показаний)
+    def aggregate_columns(rows: list) -> dict:
+        data = formats.columns(["date", "value", "min", "max", "count", "in_range"], rows)
+        in_range = data.pop("in_range")
+        data["time_in_range"] = [round(value / count * 100, 1) for value, count in zip(in_range, data["count"])]
+        return data
+
+    # Функция формирования ответа периода: NDJSON-поток, колонки (JSON | MessagePack) или объект {ключ: запись}
+    async def range_response(chunks, to_json, to_columns, key_index: int, limit, stream: bool, fmt: str,
+                             http_response: Response, id_index=None, headers=None, lookups=None):
+        if stream:
+            if fmt != "json":
+                raise ValueError("stream is supported only for the json format")
+            # Заголовки отправляются до тела, поэтому курсор следующей страницы в потоке передать нельзя
+            if limit is not None:
+                raise ValueError("limit is not supported with stream, use after / after_id to resume")
+
+            # Первая порция читается до начала ответа: ошибки запроса возвращаются кодом 400, а не обрывом потока
+            first = await anext(chunks, [])
+            await known_codes(first, lookups or {})
+
+            def to_lines(rows) -> str:
+                return "".join(js.dumps(to_json(item), ensure_ascii=False) + "\n" for item in rows)
+
+            async def lines():
+                yield to_lines(first)
+                try:
+                    async for rows in chunks:
+                        await known_codes(rows, lookups or {})
+                        yield to_lines(rows)
+                except Exception as e:
+                    # Ответ уже начат, поэтому ошибка передается последней строкой (признак неполного потока)
+                    yield js.dumps({"error": f"Stream interrupted. Error - {e}"}) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+        rows = [item async for chunk in chunks for item in chunk]
+        await known_codes(rows, lookups or {})
+
+        # Курсор следующей страницы передается в заголовках, тело ответа сохраняет прежний формат
+        headers = dict(headers or {})
+        if limit is not None and rows and len(rows) == limit:
+            headers["X-Next-After"] = str(rows[-1][key_index])
+            if id_index is not None:
+                headers["X-Next-After-Id"] = str(rows[-1][id_index])
+
+        if fmt != "json":
+            return formats.encode(to_columns(rows), fmt, headers)
+
+        http_response.headers.update(headers)
+        return {item[key_index] if id_index is None else item[id_index]: to_json(item) for item in rows}
+
     # Функция получение записей в таблице Sugar по разрезу дат
     @app.get("/get/sugar/date/start={date_start}&end={date_end}")
-    async def get_sugar_by_date(date_start: str, date_end: str, token: str = Security(auth.oauth2_scheme)):
+    async def get_sugar_by_date(date_start: str, date_end: str, http_response: Response,
+                                resolution: Optional[str] = None, after: Optional[int] = None,
+                                after_id: Optional[int] = None, limit: Optional[int] = None, stream: bool = False,
+                                format: Optional[str] = None, accept: Optional[str] = Header(None),
+                                token: str = Security(auth.oauth2_scheme)):
         # Верификация запроса
         response = verification_client(
             token=token,
@@ -352,22 +636,35 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
-                query="SELECT * FROM Sugar WHERE date BETWEEN %s AND %s",
-                params=[date_start, date_end]
+            if limit is not None and limit <= 0:
+                raise ValueError("limit must be positive")
+            fmt = formats.negotiate(accept, format)
+
+            # Исходные показания, пока они хранятся, иначе агрегаты (или явно: raw | 15m | 1h)
+            tables = {"raw": "Sugar", "15m": "Sugar_15m", "1h": "Sugar_1h"}
+            if resolution is None:
+                # Период внутри окна в памяти - всегда исходные показания, иначе граница хранения берется из памяти
+                if hot.covers("Sugar", int(date_start)):
+                    table = "Sugar"
+                else:
+                    table = retention.pick_resolution(
+                        int(date_start), int(date_end), oldest_raw=aggregates.oldest_raw
+                    )
+            elif resolution in tables:
+                table = tables[resolution]
+            else:
+                raise ValueError(f"Unknown resolution {resolution}, expected one of {list(tables)}")
+
+            chunks = range_chunks(table, int(date_start), int(date_end), after, after_id, limit, stream)
+            if table in retention.AGGREGATES:
+                return await range_response(
+                    chunks, lambda item: aggregate_json(table, item), aggregate_columns, 0, limit, stream, fmt,
+                    http_response, headers={"X-Resolution": str(retention.AGGREGATES[table])}
+                )
+            return await range_response(
+                chunks, sugar_json, sugar_columns, 1, limit, stream, fmt, http_response, id_index=0,
+                lookups=coded_columns["Sugar"]
             )
-            json_results = {}
-
-            for item in result:
-                json_results[item[0]] = {
-                    "id": item[0],
-                    "date": item[1],
-                    "value": item[2],
-                    "tendency": item[3],
-                    "difference": item[4]
-                }
-
-            return json_results
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
@@ -386,10 +683,11 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
+            result = await adb.execute_query(
                 query="SELECT * FROM Insulin WHERE id = %s",
                 params=(record_id, )
             )
+            await known_codes(result, coded_columns["Insulin"])
 
             return {
                 "id": result[0][0],
@@ -397,14 +695,18 @@ def create_app():
                 "value": result[0][2],
                 "carbs": result[0][3],
                 "duration": result[0][4],
-                "type": result[0][5],
+                "type": codes.decode("EventType", result[0][5]),
             }
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
     # Функция получение записей в таблице Insulin по разрезу дат
     @app.get("/get/insulin/date/start={date_start}&end={date_end}")
-    async def get_insulin_by_date(date_start: str, date_end: str, token: str = Security(auth.oauth2_scheme)):
+    async def get_insulin_by_date(date_start: str, date_end: str, http_response: Response,
+                                  after: Optional[int] = None, after_id: Optional[int] = None,
+                                  limit: Optional[int] = None, stream: bool = False,
+                                  format: Optional[str] = None, accept: Optional[str] = Header(None),
+                                  token: str = Security(auth.oauth2_scheme)):
         # Верификация запроса
         response = verification_client(
             token=token,
@@ -417,26 +719,57 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
-                query="SELECT * FROM Insulin WHERE date BETWEEN %s AND %s",
-                params=[date_start, date_end]
+            if limit is not None and limit <= 0:
+                raise ValueError("limit must be positive")
+            fmt = formats.negotiate(accept, format)
+
+            chunks = range_chunks("Insulin", int(date_start), int(date_end), after, after_id, limit, stream)
+            return await range_response(
+                chunks, insulin_json, insulin_columns, 1, limit, stream, fmt, http_response, id_index=0,
+                lookups=coded_columns["Insulin"]
             )
-            json_results = {}
-
-            for item in result:
-                json_results[item[0]] = {
-                    "id": item[0],
-                    "date": item[1],
-                    "value": item[2],
-                    "carbs": item[3],
-                    "duration": item[4],
-                    "type": item[5]
-                }
-
-            return json_results
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
+    # Функция преобразования строки Device в JSON-объект
+    def device_json(item) -> dict:
+        return {
+            "id": item[0],
+            "date": item[1],
+            "phone_battery": item[2],
+            "transmitter_battery": item[3],
+            "pump_battery": item[4],
+            "pump_cartridge": item[5],
+            "insulin_date": item[6],
+            "cannula_date": item[7],
+            "sensor_date": item[8],
+            "pump_name": codes.decode("DeviceName", item[9]),
+            "phone_name": codes.decode("DeviceName", item[10]),
+            "transmitter_name": codes.decode("DeviceName", item[11]),
+            "insulin_name": codes.decode("DeviceName", item[12]),
+            "sensor_name": codes.decode("DeviceName", item[13])
+        }
+
+    # Функция получения последней записи таблицы (из памяти, БД читается только после записи новых данных)
+    async def read_latest(table: str) -> dict | None:
+        """
+        :param table: Имя таблицы (Sugar | Insulin | Device)
+        :return: Последняя запись или None, если таблица пуста
+        """
+
+        cached = latest.get(table)
+        if cached is not None:
+            return cached
+
+        version = latest.version(table)
+        result = await adb.execute_query(query=f"SELECT * FROM {table} ORDER BY date DESC LIMIT 1")
+        if not result:
+            return None
+        await known_codes(result, coded_columns[table])
+        value = {"Sugar": sugar_json, "Insulin": insulin_json, "Device": device_json}[table](result[0])
+        latest.set(table, value, version)
+        return value
+
     # Функция получение последней записи в таблице Sugar
     @app.get("/get/sugar/last")
     async def get_sugar_by_last(token: str = Security(auth.oauth2_scheme)):
@@ -452,16 +785,10 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
-                query="SELECT * FROM Sugar ORDER BY date DESC LIMIT 1"
-            )
-            return {
-                "id": result[0][0],
-                "date": result[0][1],
-                "value": result[0][2],
-                "tendency": result[0][3],
-                "difference": result[0][4]
-            }
+            value = await read_latest("Sugar")
+            if value is None:
+                raise ValueError("Table Sugar is empty")
+            return value
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
@@ -480,17 +807,10 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
-                query="SELECT * FROM Insulin ORDER BY date DESC LIMIT 1"
-            )
-            return {
-                "id": result[0][0],
-                "date": result[0][1],
-                "value": result[0][2],
-                "carbs": result[0][3],
-                "duration": result[0][4],
-                "type": result[0][5],
-            }
+            value = await read_latest("Insulin")
+            if value is None:
+                raise ValueError("Table Insulin is empty")
+            return value
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
@@ -509,24 +829,43 @@ def create_app():
 
         # Генерация запроса и передача данных
         try:
-            result = db.execute_query(
-                query="SELECT * FROM Device ORDER BY date DESC LIMIT 1"
+            value = await read_latest("Device")
+            if value is None:
+                raise ValueError("Table Device is empty")
+            return value
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
+
+    # Функция получение последних записей сахара, инсулина и устройств одним запросом (для клиентов)
+    @app.get("/get/dashboard")
+    async def get_dashboard(token: str = Security(auth.oauth2_scheme)):
+        # Верификация запроса
+        response = verification_client(
+            token=token,
+            secret_key=auth.secret_key,
+            algorithm=auth.algorithm,
+            method="GET"
+        )
+        if not response['Result']:
+            raise HTTPException(status_code=response['Code'], detail=response['Detail'])
+
+        # Генерация запроса и передача данных
+        try:
+            # Записи берутся из кэша, при промахе таблицы читаются параллельно
+            sugar, insulin, device = await asyncio.gather(
+                read_latest("Sugar"), read_latest("Insulin"), read_latest("Device")
             )
+
+            # Производные поля считаются на каждый запрос (зависят от текущего времени)
+            now = int(time.time())
             return {
-                "id": result[0][0],
-                "date": result[0][1],
-                "phone_battery": result[0][2],
-                "transmitter_battery": result[0][3],
-                "pump_battery": result[0][4],
-                "pump_cartridge": result[0][5],
-                "insulin_date": result[0][6],
-                "cannula_date": result[0][7],
-                "sensor_date": result[0][8],
-                "pump_name": result[0][9],
-                "phone_name": result[0][10],
-                "transmitter_name": result[0][11],
-                "insulin_name": result[0][12],
-                "sensor_name": result[0][13]
+                "sugar": sugar,
+                "insulin": insulin,
+                "device": device,
+                "delta": sugar['difference'] if sugar else None,
+                "minutes_since_sugar": (now - sugar['date']) // 60 if sugar else None,
+                "minutes_since_insulin": (now - insulin['date']) // 60 if insulin else None,
+                "date": now
             }
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
@@ -547,15 +886,17 @@ def create_app():
         # Генерация запроса и добавление данных
         try:
             db.execute_query(
-                query="INSERT INTO Sugar VALUES (%s, %s, %s, %s, %s)",
+                query=UPSERT_SUGAR_QUERY,
                 params=[
-                    data.id,
                     data.date,
                     data.value,
-                    data.tendency,
+                    codes.encode("Tendency", data.tendency),
                     data.difference
                 ]
             )
+            latest.invalidate("Sugar")
+            hot.refresh("Sugar", [data.date])
+            aggregates.refresh([data.date])
             return {"result": True}
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
@@ -576,20 +917,78 @@ def create_app():
         # Генерация запроса и добавление данных
         try:
             db.execute_query(
-                query="INSERT INTO Insulin VALUES (%s, %s, %s, %s, %s, %s)",
+                query=UPSERT_INSULIN_QUERY,
                 params=[
-                    data.id,
                     data.date,
                     data.value,
                     data.carbs,
                     data.duration,
-                    data.type
+                    codes.encode("EventType", data.type)
                 ]
             )
+            latest.invalidate("Insulin")
+            hot.refresh("Insulin", [data.date])
             return {"result": True}
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
+    # Функция пакетного добавления данных сахара в БД
+    @app.put("/put/sugar/batch")
+    def add_sugar_batch(data: list[struct.SugarData], token: str = Security(auth.oauth2_scheme)):
+        # Верификация запроса
+        response = verification_client(
+            token=token,
+            secret_key=auth.secret_key,
+            algorithm=auth.algorithm,
+            method="PUT"
+        )
+        if not response['Result']:
+            raise HTTPException(status_code=response['Code'], detail=response['Detail'])
+
+        # Запись всех строк одним многострочным INSERT в транзакции (повторы не создают дубликатов)
+        try:
+            count = db.execute_many(
+                query=UPSERT_SUGAR_QUERY,
+                params_list=[
+                    [item.date, item.value, codes.encode("Tendency", item.tendency), item.difference]
+                    for item in data
+                ]
+            )
+            latest.invalidate("Sugar")
+            hot.refresh("Sugar", [item.date for item in data])
+            aggregates.refresh([item.date for item in data])
+            return {"result": True, "count": count}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
+
+    # Функция пакетного добавления данных инсулина в БД
+    @app.put("/put/insulin/batch")
+    def add_insulin_batch(data: list[struct.InsulinData], token: str = Security(auth.oauth2_scheme)):
+        # Верификация запроса
+        response = verification_client(
+            token=token,
+            secret_key=auth.secret_key,
+            algorithm=auth.algorithm,
+            method="PUT"
+        )
+        if not response['Result']:
+            raise HTTPException(status_code=response['Code'], detail=response['Detail'])
+
+        # Запись всех строк одним многострочным INSERT в транзакции (повторы не создают дубликатов)
+        try:
+            count = db.execute_many(
+                query=UPSERT_INSULIN_QUERY,
+                params_list=[
+                    [item.date, item.value, item.carbs, item.duration, codes.encode("EventType", item.type)]
+                    for item in data
+                ]
+            )
+            latest.invalidate("Insulin")
+            hot.refresh("Insulin", [item.date for item in data])
+            return {"result": True, "count": count}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
+
     # Функция добавления данных устройств в БД
     @app.put("/put/device")
     def add_device(data: struct.DeviceData, token: str = Security(auth.oauth2_scheme)):
@@ -619,9 +1018,12 @@ def create_app():
                     data.id, data.date,
                     data.phone_battery, data.transmitter_battery, data.pump_battery, data.pump_cartridge,
                     data.insulin_date, data.cannula_date, data.sensor_date,
-                    data.pump_name, data.phone_name, data.transmitter_name, data.insulin_name, data.sensor_name
+                    codes.encode("DeviceName", data.pump_name), codes.encode("DeviceName", data.phone_name),
+                    codes.encode("DeviceName", data.transmitter_name), codes.encode("DeviceName", data.insulin_name),
+                    codes.encode("DeviceName", data.sensor_name)
                 ]
             )
+            latest.invalidate("Device")
             return {"result": True}
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
@@ -655,13 +1057,102 @@ def create_app():
                     data.date,
                     data.phone_battery, data.transmitter_battery, data.pump_battery, data.pump_cartridge,
                     data.insulin_date, data.cannula_date, data.sensor_date,
-                    data.pump_name, data.phone_name, data.transmitter_name, data.insulin_name, data.sensor_name
+                    codes.encode("DeviceName", data.pump_name), codes.encode("DeviceName", data.phone_name),
+                    codes.encode("DeviceName", data.transmitter_name), codes.encode("DeviceName", data.insulin_name),
+                    codes.encode("DeviceName", data.sensor_name)
                 ]
             )
+            latest.invalidate("Device")
             return {"result": True}
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
 
+    # Функция записи изменившихся полей устройств (текущее состояние + история изменений)
+    @app.post("/post/device/changes")
+    def update_device_changes(data: struct.DeviceChanges, token: str = Security(auth.oauth2_scheme)):
+        # Верификация запроса
+        response = verification_client(
+            token=token,
+            secret_key=auth.secret_key,
+            algorithm=auth.algorithm,
+            method="POST"
+        )
+        if not response['Result']:
+            raise HTTPException(status_code=response['Code'], detail=response['Detail'])
+
+        # Обновление только изменившихся колонок и запись истории одной транзакцией
+        try:
+            unknown = set(data.fields) - set(migrations.COLUMNS['Device'][2:])
+            if unknown:
+                raise ValueError(f"Unknown device fields {sorted(unknown)}")
+            if not data.fields:
+                return {"result": True, "count": 0}
+
+            encoded = migrations.ENCODED_COLUMNS['Device']
+            fields = {
+                field: codes.encode(encoded[field], value) if field in encoded else value
+                for field, value in data.fields.items()
+            }
+            columns = ", ".join(fields)
+            updates = ", ".join(f"{field} = VALUES({field})" for field in ["date", *fields])
+            db.execute_transaction([
+                (
+                    f"INSERT INTO Device (id, date, {columns}) VALUES (0, %s, {', '.join(['%s'] * len(fields))}) "
+                    f"ON DUPLICATE KEY UPDATE {updates}",
+                    [data.date, *fields.values()]
+                ),
+                (
+                    "INSERT INTO DeviceHistory (date, field, value) VALUES (%s, %s, %s)",
+                    [[data.date, field, value] for field, value in fields.items()]
+                )
+            ])
+            latest.invalidate("Device")
+            return {"result": True, "count": len(fields)}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
+
+    # Функция получения истории изменений поля устройств по разрезу дат
+    @app.get("/get/device/history/field={field}&start={date_start}&end={date_end}")
+    async def get_device_history(field: str, date_start: str, date_end: str,
+                                 token: str = Security(auth.oauth2_scheme)):
+        # Верификация запроса
+        response = verification_client(
+            token=token,
+            secret_key=auth.secret_key,
+            algorithm=auth.algorithm,
+            method="GET"
+        )
+        if not response['Result']:
+            raise HTTPException(status_code=response['Code'], detail=response['Detail'])
+
+        # Генерация запроса и передача данных
+        try:
+            result = await adb.execute_query(
+                query="SELECT id, date, value FROM DeviceHistory WHERE field = %s AND date BETWEEN %s AND %s "
+                      "ORDER BY date",
+                params=[field, date_start, date_end]
+            )
+
+            # Значения хранятся дробными (DOUBLE), целые значения (даты, коды справочников) возвращаются целыми
+            result = [
+                (item[0], item[1], int(item[2]) if isinstance(item[2], float) and item[2].is_integer() else item[2])
+                for item in result
+            ]
+            lookup_table = migrations.ENCODED_COLUMNS['Device'].get(field)
+            if lookup_table:
+                await known_codes(result, {2: lookup_table})
+            return {
+                item[0]: {
+                    "id": item[0],
+                    "date": item[1],
+                    "field": field,
+                    "value": codes.decode(lookup_table, item[2]) if lookup_table else item[2]
+                }
+                for item in result
+            }
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Data is not valid. Error - {e}")
+
     return app
 
 
@@ -0,0 +1,52 @@
+import threading  # Библиотека для работы с параллельным выполнением
+import time  # Библиотека для работы со временем
+
+
+class LatestCache:
+    def __init__(self, ttl=60):
+        """
+        Кэш последних записей таблиц для эндпоинтов /get/*/last (сбрасывается эндпоинтами записи)
+        :param ttl: Время жизни записи (сек), ограничивает устаревание при записи в БД в обход API
+        """
+
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.values = {}  # {таблица: (запись, время сохранения)}
+        self.versions = {}  # {таблица: номер версии}, увеличивается при каждом сбросе таблицы
+        self.epoch = 0  # Номер полного сброса кэша
+
+    def get(self, table: str) -> dict | None:
+        """Возвращает последнюю запись таблицы из кэша (None - записи нет или она устарела)"""
+        with self.lock:
+            item = self.values.get(table)
+            if item is None or time.monotonic() - item[1] > self.ttl:
+                return None
+            return item[0]
+
+    def version(self, table: str) -> tuple:
+        """Возвращает версию таблицы (запоминается перед чтением из БД)"""
+        with self.lock:
+            return self.epoch, self.versions.get(table, 0)
+
+    def set(self, table: str, value: dict, version: tuple) -> None:
+        """
+        Сохраняет запись, прочитанную из БД
+        :param table: Имя таблицы
+        :param value: Последняя запись
+        :param version: Версия до чтения (если во время чтения был сброс, результат не сохраняется)
+        :return: None
+        """
+
+        with self.lock:
+            if (self.epoch, self.versions.get(table, 0)) == version:
+                self.values[table] = (value, time.monotonic())
+
+    def invalidate(self, *tables: str) -> None:
+        """Сбрасывает записи таблиц (без аргументов - все таблицы)"""
+        with self.lock:
+            if not tables:
+                self.values.clear()
+                self.epoch += 1
+            for table in tables:
+                self.values.pop(table, None)
+                self.versions[table] = self.versions.get(table, 0) + 1
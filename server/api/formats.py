@@ -0,0 +1,68 @@
+from fastapi import Response  # Класс ответа FastAPI
+import msgpack  # Библиотека для бинарной сериализации MessagePack
+import orjson  # Библиотека для быстрой сериализации JSON
+
+
+# Форматы ответа эндпоинтов периодов {имя: тип содержимого}
+FORMATS = {
+    "json": "application/json",  # Объект {ключ: запись} (формат по умолчанию)
+    "columns": "application/vnd.columns+json",  # Колоночный JSON {колонка: [значения]}
+    "msgpack": "application/x-msgpack"  # Колоночный MessagePack {колонка: [значения]}
+}
+
+# Типы содержимого MessagePack, которые присылают разные клиенты
+MSGPACK_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+
+
+def negotiate(accept: str | None, fmt: str | None = None) -> str:
+    """
+    Функция выбора формата ответа
+    :param accept: Заголовок Accept запроса
+    :param fmt: Явно указанный формат (json | columns | msgpack), приоритетнее заголовка
+    :return: Имя формата из FORMATS
+    """
+
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt}, expected one of {list(FORMATS)}")
+        return fmt
+
+    accept = (accept or "").lower()
+    if any(item in accept for item in MSGPACK_TYPES):
+        return "msgpack"
+    if FORMATS["columns"] in accept:
+        return "columns"
+    return "json"
+
+
+def columns(names: list, rows: list, decoders: dict | None = None) -> dict:
+    """
+    Функция преобразования строк в колонки
+    :param names: Имена колонок в порядке значений строки
+    :param rows: Строки (кортежи значений)
+    :param decoders: {колонка: функция} для колонок с кодами справочников (вызывается один раз на код)
+    :return: Словарь {колонка: [значения]}
+    """
+
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    result = {name: list(column) for name, column in zip(names, values)}
+    for name, decode in (decoders or {}).items():
+        mapping = {code: decode(code) for code in set(result[name])}
+        result[name] = [mapping[code] for code in result[name]]
+    return result
+
+
+def encode(data: dict, fmt: str, headers: dict | None = None) -> Response:
+    """
+    Функция сериализации колонок в ответ выбранного формата
+    :param data: Словарь {колонка: [значения]}
+    :param fmt: columns | msgpack
+    :param headers: Дополнительные заголовки ответа
+    :return: Ответ FastAPI
+    """
+
+    if fmt == "msgpack":
+        body = msgpack.packb(data, use_bin_type=True)
+    else:
+        body = orjson.dumps(data)
+    return Response(content=body, media_type=FORMATS[fmt], headers=headers)
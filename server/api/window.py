@@ -0,0 +1,288 @@
+import threading  # Библиотека для работы с параллельным выполнением
+import time  # Библиотека для работы со временем
+import numpy as np  # Библиотека для работы с массивами
+
+from database import migrations  # Модуль со схемой таблиц
+
+
+# Типы колонок буферов (строковые колонки хранятся кодами справочников)
+DTYPES = {
+    "Sugar": {"id": np.int64, "date": np.int64, "value": np.int32, "tendency": np.int32, "difference": np.int32},
+    "Insulin": {
+        "id": np.int64, "date": np.int64, "value": np.float64, "carbs": np.int32, "duration": np.int32, "type": np.int32
+    }
+}
+
+# Значение, которым в буфере хранится NULL целочисленной колонки
+# (вне диапазона колонок SMALLINT / TINYINT / INT UNSIGNED, поэтому не совпадает с реальными значениями,
+# например difference = -1)
+NULL_CODE = int(np.iinfo(np.int32).min)
+
+
+def to_rows(table: str, columns: dict) -> list:
+    """
+    Функция преобразования колонок буфера в строки, как их возвращает БД
+    :param table: Имя таблицы
+    :param columns: Словарь {колонка: массив}
+    :return: Список строк в порядке COLUMNS (NaN и NULL_CODE заменяются на None)
+    """
+
+    values = []
+    for column in migrations.COLUMNS[table]:
+        array = columns[column]
+        mask = np.isnan(array) if np.issubdtype(array.dtype, np.floating) else array == NULL_CODE
+        items = array.tolist()
+        for index in np.flatnonzero(mask).tolist():
+            items[index] = None
+        values.append(items)
+    return list(zip(*values))
+
+
+class RingBuffer:
+    def __init__(self, table: str, window: int, capacity=8192):
+        """
+        Буфер последних строк таблицы в массивах NumPy (колонка - массив), строки упорядочены по date.
+        Новые строки дописываются в конец, строки старше window секунд от последней вытесняются при заполнении
+        :param table: Имя таблицы (Sugar | Insulin)
+        :param window: Глубина окна (сек)
+        :param capacity: Начальная емкость массивов (строк)
+        """
+
+        self.table = table
+        self.window = window
+        self.columns = migrations.COLUMNS[table]
+        self.dtypes = DTYPES[table]
+        self.lock = threading.Lock()
+        self.arrays = {column: np.empty(capacity, dtype=self.dtypes[column]) for column in self.columns}
+        self.size = 0
+        self.since = None  # Начало периода, за который буфер содержит все строки (None - буфер не загружен)
+        self.changes = 0  # Счетчик изменений (загрузка из БД не применяется, если во время чтения были записи)
+
+    def to_value(self, column: str, value):
+        """Приводит значение из БД к значению массива (NULL целочисленной колонки - NULL_CODE, дробной - NaN)"""
+        if value is not None:
+            return value
+        return np.nan if np.issubdtype(self.dtypes[column], np.floating) else NULL_CODE
+
+    def grow(self, required: int) -> None:
+        """
+        Освобождает место под required строк: при заполнении массивов вытесняются строки старше окна
+        (сдвиг выполняется редко, поэтому запись в среднем O(1)), при нехватке места емкость удваивается
+        """
+
+        capacity = len(self.arrays['date'])
+        if self.size + required <= capacity:
+            return
+
+        if self.size:
+            cutoff = int(self.arrays['date'][self.size - 1]) - self.window
+            first = int(np.searchsorted(self.arrays['date'][:self.size], cutoff, side="left"))
+            if first:
+                for column in self.columns:
+                    array = self.arrays[column]
+                    array[:self.size - first] = array[first:self.size]
+                self.size -= first
+                self.since = max(self.since, cutoff)
+
+        if self.size + required > capacity:
+            capacity = max(capacity * 2, self.size + required)
+            for column in self.columns:
+                array = np.empty(capacity, dtype=self.dtypes[column])
+                array[:self.size] = self.arrays[column][:self.size]
+                self.arrays[column] = array
+
+    def load(self, rows: list, since: int, changes=None) -> bool:
+        """
+        Заполняет буфер строками из БД
+        :param rows: Строки в порядке COLUMNS, отсортированные по date
+        :param since: Начало периода, за который переданы все строки
+        :param changes: Значение счетчика изменений до чтения строк (если буфер с тех пор менялся, строки не применяются)
+        :return: Буфер заполнен
+        """
+
+        with self.lock:
+            if changes is not None and changes != self.changes:
+                return False
+            self.changes += 1
+            self.size = 0
+            self.since = since
+            self.grow(len(rows))
+            for index, column in enumerate(self.columns):
+                self.arrays[column][:len(rows)] = [self.to_value(column, row[index]) for row in rows]
+            self.size = len(rows)
+            return True
+
+    def upsert(self, rows: list) -> None:
+        """
+        Записывает строки в буфер: строка с той же датой заменяется, более новая дописывается в конец,
+        более старая (досылка) вставляется на свое место
+        :param rows: Строки в порядке COLUMNS
+        :return: None
+        """
+
+        date_index = self.columns.index("date")
+        key_index = self.columns.index("type") if "type" in self.columns else None
+        with self.lock:
+            self.changes += 1
+            if self.since is None:
+                return
+            for row in sorted(rows, key=lambda item: item[date_index]):
+                date = row[date_index]
+                if date < self.since:
+                    continue
+                values = [self.to_value(column, row[index]) for index, column in enumerate(self.columns)]
+
+                dates = self.arrays['date'][:self.size]
+                position = int(np.searchsorted(dates, date, side="left"))
+
+                # Поиск строки с тем же ключом (date или date + type) среди строк с той же датой
+                match = None
+                end = int(np.searchsorted(dates, date, side="right"))
+                for candidate in range(position, end):
+                    if key_index is None or self.arrays['type'][candidate] == values[key_index]:
+                        match = candidate
+                        break
+
+                if match is not None:
+                    for index, column in enumerate(self.columns):
+                        self.arrays[column][match] = values[index]
+                    continue
+
+                self.grow(1)
+                if date < self.since:
+                    continue
+                position = int(np.searchsorted(self.arrays['date'][:self.size], date, side="right"))
+                for index, column in enumerate(self.columns):
+                    array = self.arrays[column]
+                    array[position + 1:self.size + 1] = array[position:self.size]
+                    array[position] = values[index]
+                self.size += 1
+
+    def invalidate(self) -> None:
+        """Помечает буфер незагруженным (запросы идут в БД до следующей загрузки)"""
+        with self.lock:
+            self.changes += 1
+            self.since = None
+            self.size = 0
+
+    def covers(self, date_start: int) -> bool:
+        """Проверяет, содержит ли буфер все строки начиная с date_start"""
+        return self.since is not None and date_start >= self.since
+
+    def range(self, date_start: int, date_end: int) -> dict | None:
+        """
+        Возвращает копии колонок за период [date_start, date_end] (бинарный поиск по date)
+        :param date_start: Начало периода (UNIX)
+        :param date_end: Конец периода (UNIX)
+        :return: Словарь {колонка: массив} или None, если период не покрыт буфером
+        """
+
+        with self.lock:
+            if not self.covers(date_start):
+                return None
+            dates = self.arrays['date'][:self.size]
+            first = int(np.searchsorted(dates, date_start, side="left"))
+            last = int(np.searchsorted(dates, date_end, side="right"))
+            return {column: self.arrays[column][first:last].copy() for column in self.columns}
+
+
+class HotWindow:
+    def __init__(self, db, days=14):
+        """
+        Окно последних дней таблиц Sugar и Insulin в памяти API-сервера.
+        Заполняется из БД при запуске и пополняется эндпоинтами записи
+        (записи в БД в обход API попадают в окно только после перезапуска сервера)
+        :param db: Объект БД (database.MySQL)
+        :param days: Глубина окна (дней)
+        """
+
+        self.db = db
+        self.window = days * 86400
+        self.buffers = {table: RingBuffer(table, self.window) for table in DTYPES}
+
+    def load(self, attempts=3) -> bool:
+        """
+        Загружает строки за последние days дней из БД (уже загруженные буферы не перечитываются).
+        Незагруженный буфер перечитывается API повторно: при следующем запросе периода или обслуживании
+        :param attempts: Кол-во попыток чтения таблицы (чтение повторяется, если во время него буфер изменился)
+        :return: Все буферы загружены
+        """
+
+        for table, buffer in self.buffers.items():
+            if buffer.since is not None:
+                continue
+            for _ in range(attempts):
+                changes = buffer.changes
+                since = int(time.time()) - self.window
+                rows = self.db.execute_query(
+                    query=f"SELECT {', '.join(buffer.columns)} FROM {table} WHERE date >= %s ORDER BY date",
+                    params=[since]
+                )
+                if not buffer.load(rows, since, changes):
+                    continue
+                print(f"\t{table}: в памяти {len(rows)} строк за {self.window // 86400} дней")
+                break
+            else:
+                print(f"⚠️ {table}: окно в памяти не загружено (таблица изменялась во время чтения), "
+                      f"повтор при следующем запросе")
+        return self.loaded()
+
+    def loaded(self) -> bool:
+        """Проверяет, загружены ли все буферы"""
+        return all(buffer.since is not None for buffer in self.buffers.values())
+
+    def invalidate(self) -> None:
+        """Помечает все буферы незагруженными (после произвольных изменений таблиц)"""
+        for buffer in self.buffers.values():
+            buffer.invalidate()
+
+    def refresh(self, table: str, dates: list) -> None:
+        """
+        Перечитывает из БД строки с указанными датами (после записи, id выдает БД) и записывает их в буфер
+        :param table: Имя таблицы
+        :param dates: Даты записанных строк
+        :return: None
+        """
+
+        buffer = self.buffers[table]
+        dates = [date for date in set(dates) if buffer.covers(date)]
+        if not dates:
+            # Пустая запись увеличивает счетчик изменений, поэтому идущая загрузка буфера перечитает таблицу
+            buffer.upsert([])
+            return
+        rows = self.db.execute_query(
+            query=f"SELECT {', '.join(buffer.columns)} FROM {table} WHERE date IN ({', '.join(['%s'] * len(dates))})",
+            params=dates
+        )
+        buffer.upsert(rows)
+
+    def covers(self, table: str, date_start: int) -> bool:
+        """Проверяет, содержит ли окно таблицы все строки начиная с date_start"""
+        return self.buffers[table].covers(date_start)
+
+    def range(self, table: str, date_start: int, date_end: int) -> dict | None:
+        """Возвращает колонки таблицы за период или None, если период старше окна"""
+        return self.buffers[table].range(date_start, date_end)
+
+
+def keyset(columns: dict, after=None, after_id=None, limit=None) -> dict:
+    """
+    Функция выборки страницы колонок по ключу (date, id): строки после курсора в порядке (date, id)
+    :param columns: Словарь {колонка: массив} (результат RingBuffer.range)
+    :param after: Дата последней строки предыдущей страницы (None - с начала периода)
+    :param after_id: id последней строки предыдущей страницы (None - пропустить все строки с датой after)
+    :param limit: Кол-во строк на странице (None - без ограничения)
+    :return: Словарь {колонка: массив} страницы
+    """
+
+    dates, ids = columns['date'], columns['id']
+    if after is not None:
+        mask = dates > after
+        if after_id is not None:
+            mask |= (dates == after) & (ids > after_id)
+        columns = {column: array[mask] for column, array in columns.items()}
+        dates, ids = columns['date'], columns['id']
+    order = np.lexsort((ids, dates))
+    if limit is not None:
+        order = order[:limit]
+    return {column: array[order] for column, array in columns.items()}
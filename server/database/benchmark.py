@@ -0,0 +1,108 @@
+import random  # Библиотека для генерации случайных значений
+import time  # Библиотека для работы со временем
+from database import database  # Модуль для взаимодействия с БД
+from database import migrations  # Модуль со схемой таблиц
+import config as cfg  # Настройки программы
+
+
+# Таблица без ключей (схема до миграции 1)
+PLAIN_TABLE = """CREATE TABLE {table} (
+id INT,
+date INT,
+value FLOAT,
+tendency TEXT,
+difference FLOAT
+)"""
+
+
+def fill_table(db, table: str, start_date: int, count: int, chunk_size=5000) -> None:
+    """
+    Функция заполнения таблицы синтетическими показаниями сахара (раз в 5 минут)
+    :param db: Объект БД (database.MySQL)
+    :param table: Имя таблицы
+    :param start_date: Дата первой записи (UNIX)
+    :param count: Кол-во строк
+    :param chunk_size: Кол-во строк в одном INSERT
+    :return: None
+    """
+
+    for offset in range(0, count, chunk_size):
+        rows = [
+            [start_date + (offset + i) * 300, random.randint(60, 250), "Flat", random.randint(-10, 10)]
+            for i in range(min(chunk_size, count - offset))
+        ]
+        db.execute_many(
+            query=f"INSERT INTO {table} (date, value, tendency, difference) VALUES (%s, %s, %s, %s)",
+            params_list=rows
+        )
+
+
+def measure_range_query(db, table: str, first_date: int, last_date: int, repeats: int) -> float:
+    """
+    Функция замера среднего времени запроса за сутки (WHERE date BETWEEN)
+    :return: Среднее время запроса (мс)
+    """
+
+    total = 0.0
+    for _ in range(repeats):
+        start = random.randint(first_date, max(first_date, last_date - 86400))
+        begin = time.perf_counter()
+        db.execute_query(
+            query=f"SELECT * FROM {table} WHERE date BETWEEN %s AND %s",
+            params=[start, start + 86400]
+        )
+        total += time.perf_counter() - begin
+    return total / repeats * 1000
+
+
+# Функция сравнения времени запросов по диапазону дат до и после миграции
+def start(sizes=(10000, 50000, 100000, 200000), repeats=20):
+    """
+    Функция замера задержки запроса по диапазону дат в зависимости от размера таблицы
+    (таблица без ключей против таблицы со схемой миграции 1)
+    :param sizes: Размеры таблиц (кол-во строк)
+    :param repeats: Кол-во замеров на каждый размер
+    :return: None
+    """
+
+    db = database.MySQL(
+        host=cfg.DataBase.host,
+        port=cfg.DataBase.port,
+        user=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.login"),
+        password=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.password"),
+        database=cfg.DataBase.database,
+        retry_max=cfg.DataBase.retry_max,
+        retry_delay=cfg.DataBase.retry_delay,
+        timeout=cfg.DataBase.timeout,
+        read_timeout=cfg.DataBase.read_timeout,
+        write_timeout=cfg.DataBase.write_timeout
+    )
+
+    tables = {
+        "BenchSugarPlain": PLAIN_TABLE,
+        "BenchSugarIndexed": migrations.SUGAR_TABLE_V1
+    }
+    for table, create_query in tables.items():
+        db.execute_query(query=f"DROP TABLE IF EXISTS {table}")
+        db.execute_query(query=create_query.format(table=table))
+
+    first_date = int(time.time()) - max(sizes) * 300
+    filled = 0
+    print(f"{'Строк':>10} | {'Без ключей (мс)':>16} | {'С индексом (мс)':>16}")
+    try:
+        for size in sorted(sizes):
+            for table in tables:
+                fill_table(db, table, first_date + filled * 300, size - filled)
+            filled = size
+
+            last_date = first_date + size * 300
+            plain = measure_range_query(db, "BenchSugarPlain", first_date, last_date, repeats)
+            indexed = measure_range_query(db, "BenchSugarIndexed", first_date, last_date, repeats)
+            print(f"{size:>10} | {plain:>16.2f} | {indexed:>16.2f}")
+    finally:
+        for table in tables:
+            db.execute_query(query=f"DROP TABLE IF EXISTS {table}")
+
+
+if __name__ == '__main__':
+    start()
@@ -1,9 +1,157 @@
 import pymysql  # Библиотека для работы с БД (MySQL)
+import aiomysql  # Библиотека для асинхронной работы с БД (MySQL)
+import asyncio  # Библиотека для работы с асинхронным кодом
 import time  # Библиотека для работы со временем
+import queue  # Библиотека для работы с потокобезопасными очередями
+import threading  # Библиотека для работы с параллельным выполнением
+import tempfile  # Библиотека для работы с временными файлами
+import os  # Библиотека для работы с операционной системой
+from itertools import islice  # Библиотека для разбиения итераторов на порции
+from contextlib import contextmanager  # Библиотека для создания контекстных менеджеров
+
+
+# Коды ошибок обрыва связи с сервером MySQL (только после них запрос повторяется)
+# 2006 - MySQL server has gone away, 2013 - Lost connection during query, 2055 - Lost connection (system error)
+CONNECTION_LOST_CODES = (2006, 2013, 2055)
+
+
+def is_connection_lost(error: Exception) -> bool:
+    """
+    Функция проверки, вызвана ли ошибка обрывом связи (остальные ошибки сервера, например блокировки,
+    не повторяются: неидемпотентный запрос мог быть уже выполнен)
+    :param error: Исключение pymysql
+    :return: True - запрос можно повторить на новом соединении
+    """
+
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) and error.args[0] in CONNECTION_LOST_CODES
+
+
+class ConnectionPool:
+    def __init__(self, factory, min_size=1, max_size=10, timeout=30, recycle=3600, ping_interval=60):
+        """
+        Потокобезопасный пул соединений с БД
+        :param factory: Функция создания нового соединения
+        :param min_size: Минимальное кол-во соединений, открываемых заранее
+        :param max_size: Максимальное кол-во одновременно открытых соединений
+        :param timeout: Время ожидания свободного соединения (сек)
+        :param recycle: Время простоя, после которого соединение пересоздается (сек)
+        :param ping_interval: Время простоя, после которого соединение проверяется перед выдачей (сек)
+        """
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.size = 0
+        self.lock = threading.Lock()
+        self.idle = queue.LifoQueue()  # Последнее возвращенное соединение выдается первым (оно "теплое")
+
+        for _ in range(min_size):
+            self.idle.put((self.create(), time.monotonic()))
+
+    def create(self):
+        """Создает новое соединение и учитывает его в размере пула"""
+        with self.lock:
+            self.size += 1
+        return self.open()
+
+    def open(self):
+        """Открывает соединение под уже зарезервированное место в пуле"""
+        try:
+            return self.factory()
+        except Exception:
+            with self.lock:
+                self.size -= 1
+            raise
+
+    def discard(self, connection) -> None:
+        """Закрывает соединение и освобождает место в пуле"""
+        with self.lock:
+            self.size -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_alive(connection) -> bool:
+        """Проверяет, активно ли соединение"""
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Выдает свободное соединение из пула (или создает новое, если лимит не достигнут)"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                connection, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_create = self.size < self.max_size
+                    if can_create:
+                        self.size += 1
+                if can_create:
+                    return self.open()
+                try:
+                    connection, last_used = self.idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise TimeoutError(f"❌ Нет свободных соединений с БД в течение {self.timeout} сек")
+
+            # Пересоздание соединений, простаивавших дольше допустимого
+            if time.monotonic() - last_used > self.recycle:
+                self.discard(connection)
+                return self.create()
+
+            # Проверка работоспособности только долго простаивавших соединений (остальные проверяются ошибкой запроса)
+            if time.monotonic() - last_used > self.ping_interval and not self.is_alive(connection):
+                print("🔄 Соединение с БД потеряно, переподключение...")
+                self.discard(connection)
+                continue
+
+            return connection
+
+    def release(self, connection, broken=False) -> None:
+        """Возвращает соединение в пул (сломанные соединения закрываются)"""
+        if broken:
+            self.discard(connection)
+        else:
+            self.idle.put((connection, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер для выдачи и возврата соединения"""
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            # Возврат выполняется и при досрочном закрытии генератора, использующего соединение
+            self.release(connection, broken=broken)
+
+    def close(self) -> None:
+        """Закрывает все простаивающие соединения пула"""
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(connection)
 
 
 class MySQL:
-    def __init__(self, host, port, user, password, database, retry_max, retry_delay, timeout, read_timeout, write_timeout):
+    def __init__(self, host, port, user, password, database, retry_max, retry_delay, timeout, read_timeout, write_timeout,
+                 pool_min=1, pool_max=10, pool_timeout=30, pool_recycle=3600, pool_ping_interval=60, query_retries=3,
+                 local_infile=False):
         """
         Класс Базы Данных MySQL
         :param host: Ip-адрес для подключения к MySQL
@@ -13,6 +161,13 @@ class MySQL:
         :param database: Имя Базы Данных
         :param retry_max: Максимальное кол-во попыток подключения
         :param retry_delay: Ожидания между попытками подключения
+        :param pool_min: Минимальное кол-во соединений в пуле
+        :param pool_max: Максимальное кол-во соединений в пуле
+        :param pool_timeout: Время ожидания свободного соединения из пула (сек)
+        :param pool_recycle: Время простоя, после которого соединение пересоздается (сек)
+        :param pool_ping_interval: Время простоя, после которого соединение проверяется перед выдачей (сек)
+        :param query_retries: Максимальное кол-во повторов запроса при обрыве связи
+        :param local_infile: Разрешить загрузку файлов через LOAD DATA LOCAL INFILE
         """
 
         self.host = host
@@ -25,15 +180,23 @@ class MySQL:
         self.timeout = timeout
         self.read_timeout = read_timeout
         self.write_timeout = write_timeout
-        self.connection = None
-        self.connect()
+        self.query_retries = query_retries
+        self.local_infile = local_infile
+        self.pool = ConnectionPool(
+            factory=self.connect,
+            min_size=pool_min,
+            max_size=pool_max,
+            timeout=pool_timeout,
+            recycle=pool_recycle,
+            ping_interval=pool_ping_interval
+        )
 
     def connect(self):
-        """Устанавливает подключение к базе данных с обработкой ошибок"""
+        """Устанавливает новое подключение к базе данных с обработкой ошибок"""
         retries = 0
         while retries < self.max_retries:
             try:
-                self.connection = pymysql.connect(
+                connection = pymysql.connect(
                     host=self.host,
                     port=self.port,
                     user=self.user,
@@ -42,24 +205,38 @@ class MySQL:
                     autocommit=True,  # Автоматически фиксирует изменения
                     connect_timeout=self.timeout,
                     read_timeout=self.read_timeout,
-                    write_timeout=self.write_timeout
+                    write_timeout=self.write_timeout,
+                    local_infile=self.local_infile
                 )
                 print("✅ Подключение к БД установлено")
-                return
+                return connection
             except pymysql.err.OperationalError as e:
                 print(f"⚠️ Ошибка подключения к БД: {e}, повтор через {self.retry_delay} сек...")
                 time.sleep(self.retry_delay)
                 retries += 1
         raise Exception("❌ Не удалось подключиться к БД после нескольких попыток")
 
-    def reconnect_if_needed(self):
-        """Проверяет, активно ли соединение, и подключается при необходимости"""
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
-            print("🔄 Соединение с БД потеряно, переподключение...")
-            self.connect()
+    def close(self):
+        """Закрывает все соединения пула"""
+        self.pool.close()
+
+    def run_with_retry(self, action):
+        """Выполняет действие над соединением из пула с ограниченным кол-вом повторов при обрыве связи
+        :param action: Функция, принимающая соединение
+        :return : Результат функции
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.pool.connection() as connection:
+                    return action(connection)
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+                attempt += 1
+                if not is_connection_lost(e) or attempt > self.query_retries:
+                    raise
+                delay = self.retry_delay * 2 ** (attempt - 1)  # Экспоненциальная задержка между повторами
+                print(f"⚠️ Ошибка запроса: {e}, повтор {attempt}/{self.query_retries} через {delay} сек...")
+                time.sleep(delay)
 
     def execute_query(self, query, params=None):
         """Выполняет SQL-запрос с автоматическим подключением при обрыве связи
@@ -67,12 +244,289 @@ class MySQL:
         :param params: Параметры для запроса
         :return : Данные от БД
         """
-        self.reconnect_if_needed()
-        try:
-            with self.connection.cursor() as cursor:
+        def action(connection):
+            with connection.cursor() as cursor:
                 cursor.execute(query, params)
                 return cursor.fetchall()
-        except pymysql.err.OperationalError:
-            print("⚠️ Ошибка запроса, попытка переподключения...")
-            self.connect()
-            return self.execute_query(query, params)  # Повторный запрос после переподключения
+
+        return self.run_with_retry(action)
+
+    def execute_update(self, query, params=None):
+        """Выполняет запрос изменения данных (INSERT ... SELECT, UPDATE, DELETE)
+        :param query: SQL запрос
+        :param params: Параметры для запроса
+        :return : Кол-во затронутых строк
+        """
+        def action(connection):
+            with connection.cursor() as cursor:
+                return cursor.execute(query, params)
+
+        return self.run_with_retry(action)
+
+    def execute_many(self, query, params_list):
+        """Выполняет пакетный SQL-запрос (многострочный INSERT) внутри одной транзакции
+        :param query: SQL запрос вида INSERT ... VALUES (%s, ...)
+        :param params_list: Список параметров для каждой строки
+        :return : Кол-во затронутых строк
+        """
+        if not params_list:
+            return 0
+
+        def action(connection):
+            try:
+                connection.begin()
+                with connection.cursor() as cursor:
+                    affected = cursor.executemany(query, params_list)
+                connection.commit()
+                return affected
+            except Exception:
+                try:
+                    connection.rollback()
+                except pymysql.err.MySQLError:
+                    pass
+                raise
+
+        # Транзакция откатывается при ошибке, поэтому повтор безопасен
+        return self.run_with_retry(action)
+
+    def execute_transaction(self, statements):
+        """Выполняет несколько SQL-запросов внутри одной транзакции
+        :param statements: Список пар (запрос, параметры) или (запрос, список параметров для executemany)
+        :return : Кол-во затронутых строк по каждому запросу
+        """
+        def action(connection):
+            try:
+                connection.begin()
+                affected = []
+                with connection.cursor() as cursor:
+                    for query, params in statements:
+                        if params and isinstance(params[0], (list, tuple)):
+                            affected.append(cursor.executemany(query, params))
+                        else:
+                            affected.append(cursor.execute(query, params))
+                connection.commit()
+                return affected
+            except Exception:
+                try:
+                    connection.rollback()
+                except pymysql.err.MySQLError:
+                    pass
+                raise
+
+        # Транзакция откатывается при ошибке, поэтому повтор безопасен
+        return self.run_with_retry(action)
+
+    def stream_query(self, query, params=None, chunk_size=1000):
+        """Потоково читает результат запроса серверным (небуферизованным) курсором, память ограничена порцией
+        :param query: SQL запрос
+        :param params: Параметры для запроса
+        :param chunk_size: Кол-во строк в одной порции
+        :return : Генератор порций строк
+        """
+        with self.pool.connection() as connection:
+            yield from self.stream_rows(connection, query, params, chunk_size)
+
+    @staticmethod
+    def stream_rows(connection, query, params=None, chunk_size=1000):
+        """Потоково читает результат запроса серверным курсором на переданном соединении
+        :param connection: Соединение (например, из snapshot)
+        :param query: SQL запрос
+        :param params: Параметры для запроса
+        :param chunk_size: Кол-во строк в одной порции
+        :return : Генератор порций строк
+        """
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+    @contextmanager
+    def snapshot(self):
+        """Контекстный менеджер соединения с согласованным снимком БД: все запросы через это соединение
+        видят данные всех таблиц на один момент (START TRANSACTION WITH CONSISTENT SNAPSHOT)
+        :return : Соединение с открытой транзакцией
+        """
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            try:
+                yield connection
+            finally:
+                connection.commit()
+
+    def insert_many(self, table, columns, rows, chunk_size=1000, update_columns=None, total=None, progress=None):
+        """Пакетная запись строк порциями (многострочный INSERT, одна транзакция на порцию)
+        :param table: Имя таблицы
+        :param columns: Список колонок
+        :param rows: Список (или итератор) строк
+        :param chunk_size: Кол-во строк в одной порции
+        :param update_columns: Колонки для обновления при совпадении ключа (ON DUPLICATE KEY UPDATE)
+        :param total: Общее кол-во строк (для отчета о прогрессе, если rows - итератор)
+        :param progress: Функция progress(записано, всего, строк/сек), вызываемая после каждой порции
+        :return : Статистика записи {"rows", "seconds", "rows_per_sec"}
+        """
+        query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                 f"VALUES ({', '.join(['%s'] * len(columns))})")
+        if update_columns:
+            query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{item} = VALUES({item})" for item in update_columns)
+
+        if total is None and hasattr(rows, '__len__'):
+            total = len(rows)
+
+        written = 0
+        start_time = time.monotonic()
+        iterator = iter(rows)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            self.execute_many(query, chunk)
+            written += len(chunk)
+            if progress is not None:
+                progress(written, total, written / max(time.monotonic() - start_time, 1e-6))
+
+        seconds = time.monotonic() - start_time
+        return {"rows": written, "seconds": round(seconds, 3), "rows_per_sec": round(written / max(seconds, 1e-6))}
+
+    @staticmethod
+    def to_infile_value(value) -> str:
+        """Преобразует значение в формат файла LOAD DATA (NULL -> \\N, экранирование спецсимволов)"""
+        if value is None:
+            return "\\N"
+        return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+    def load_data(self, table, columns, rows, replace=False):
+        """Быстрая загрузка большого объема строк через LOAD DATA LOCAL INFILE
+        (требует local_infile=True и включенного local_infile на сервере MySQL)
+        :param table: Имя таблицы
+        :param columns: Список колонок
+        :param rows: Список (или итератор) строк
+        :param replace: Заменять строки при совпадении ключа (иначе дубликаты пропускаются)
+        :return : Статистика записи {"rows", "seconds", "rows_per_sec"}
+        """
+        start_time = time.monotonic()
+
+        # Запись строк во временный файл (TAB-разделитель, экранирование обратным слешем)
+        written = 0
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", suffix=".tsv", delete=False) as f:
+            path = f.name
+            for row in rows:
+                f.write("\t".join(self.to_infile_value(value) for value in row) + "\n")
+                written += 1
+
+        try:
+            query = (f"LOAD DATA LOCAL INFILE %s {'REPLACE' if replace else 'IGNORE'} INTO TABLE {table} "
+                     f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                     f"LINES TERMINATED BY '\\n' ({', '.join(columns)})")
+            self.execute_query(query, [path])
+        finally:
+            os.remove(path)
+
+        seconds = time.monotonic() - start_time
+        return {"rows": written, "seconds": round(seconds, 3), "rows_per_sec": round(written / max(seconds, 1e-6))}
+
+
+class AsyncMySQL:
+    def __init__(self, host, port, user, password, database, retry_delay, timeout,
+                 pool_min=1, pool_max=10, pool_recycle=3600, query_retries=3):
+        """
+        Асинхронный класс Базы Данных MySQL (для async-эндпоинтов, не блокирует цикл событий)
+        :param host: Ip-адрес для подключения к MySQL
+        :param port: Порт для подключения к MySQL
+        :param user: Логин пользователя для авторизации
+        :param password: Пароль пользователя для авторизации
+        :param database: Имя Базы Данных
+        :param retry_delay: Ожидания между попытками выполнения запроса
+        :param timeout: Время ожидания подключения (сек)
+        :param pool_min: Минимальное кол-во соединений в пуле
+        :param pool_max: Максимальное кол-во соединений в пуле
+        :param pool_recycle: Время простоя, после которого соединение пересоздается (сек)
+        :param query_retries: Максимальное кол-во повторов запроса при обрыве связи
+        """
+
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_recycle = pool_recycle
+        self.query_retries = query_retries
+        self.pool = None
+        self.lock = asyncio.Lock()
+
+    async def connect(self):
+        """Создает пул соединений (пул привязан к текущему циклу событий)"""
+        async with self.lock:
+            if self.pool is not None:
+                return
+            self.pool = await aiomysql.create_pool(
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                password=self.password,
+                db=self.database,
+                autocommit=True,  # Автоматически фиксирует изменения
+                connect_timeout=self.timeout,
+                minsize=self.pool_min,
+                maxsize=self.pool_max,
+                pool_recycle=self.pool_recycle
+            )
+            print("✅ Асинхронный пул подключений к БД создан")
+
+    async def close(self):
+        """Закрывает все соединения пула"""
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def execute_query(self, query, params=None):
+        """Выполняет SQL-запрос с ограниченным кол-вом повторов при обрыве связи
+        :param query: SQL запрос
+        :param params: Параметры для запроса
+        :return : Данные от БД
+        """
+        if self.pool is None:
+            await self.connect()
+
+        attempt = 0
+        while True:
+            try:
+                async with self.pool.acquire() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(query, params)
+                        return await cursor.fetchall()
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+                attempt += 1
+                if not is_connection_lost(e) or attempt > self.query_retries:
+                    raise
+                delay = self.retry_delay * 2 ** (attempt - 1)  # Экспоненциальная задержка между повторами
+                print(f"⚠️ Ошибка запроса: {e}, повтор {attempt}/{self.query_retries} через {delay} сек...")
+                await asyncio.sleep(delay)
+
+    async def stream_query(self, query, params=None, chunk_size=1000):
+        """Потоково читает результат запроса серверным курсором (память ограничена порцией)
+        :param query: SQL запрос
+        :param params: Параметры для запроса
+        :param chunk_size: Кол-во строк в одной порции
+        :return : Асинхронный генератор порций строк
+        """
+        if self.pool is None:
+            await self.connect()
+
+        async with self.pool.acquire() as connection:
+            async with connection.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield rows
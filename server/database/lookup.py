@@ -0,0 +1,100 @@
+import threading  # Библиотека для работы с параллельным выполнением
+from database import migrations  # Модуль со схемой таблиц
+
+
+class LookupCodes:
+    def __init__(self, db, reload=True):
+        """
+        Класс преобразования строковых значений в коды справочников и обратно (справочники хранятся в памяти)
+        :param db: Объект БД (database.MySQL)
+        :param reload: Перечитывать справочники при неизвестном коде (False - для асинхронного кода,
+        справочники дочитываются заранее через load_async)
+        """
+
+        self.db = db
+        self.reload = reload
+        self.lock = threading.Lock()
+        self.codes = {lookup: {} for lookup in migrations.LOOKUP_SEEDS}  # {справочник: {значение: код}}
+        self.names = {lookup: {} for lookup in migrations.LOOKUP_SEEDS}  # {справочник: {код: значение}}
+
+    def load(self) -> None:
+        """Загружает все справочники из БД"""
+        for lookup in migrations.LOOKUP_SEEDS:
+            self.store(lookup, self.db.execute_query(query=f"SELECT id, name FROM {lookup}"))
+
+    async def load_async(self, adb) -> None:
+        """Загружает все справочники через асинхронное подключение (database.AsyncMySQL)"""
+        for lookup in migrations.LOOKUP_SEEDS:
+            self.store(lookup, await adb.execute_query(query=f"SELECT id, name FROM {lookup}"))
+
+    def store(self, lookup: str, rows) -> None:
+        """Заменяет справочник в памяти строками (id, name)"""
+        with self.lock:
+            self.codes[lookup] = {item[1]: item[0] for item in rows}
+            self.names[lookup] = {item[0]: item[1] for item in rows}
+
+    def missing(self, lookup: str, codes) -> bool:
+        """Проверяет, есть ли среди кодов неизвестные (добавленные в БД в обход этого процесса)"""
+        names = self.names[lookup]
+        return any(code is not None and code not in names for code in codes)
+
+    def encode(self, lookup: str, name):
+        """
+        Возвращает код значения, новое значение добавляется в справочник
+        :param lookup: Имя справочника
+        :param name: Строковое значение
+        :return: Код значения (None для None)
+        """
+
+        if name is None:
+            return None
+        code = self.codes[lookup].get(name)
+        if code is not None:
+            return code
+
+        # Значение могло быть добавлено другим процессом, поэтому код читается после INSERT IGNORE
+        self.db.execute_query(
+            query=f"INSERT IGNORE INTO {lookup} (date, name) VALUES (UNIX_TIMESTAMP(), %s)",
+            params=[name]
+        )
+        code = self.db.execute_query(query=f"SELECT id FROM {lookup} WHERE name = %s", params=[name])[0][0]
+        with self.lock:
+            self.codes[lookup][name] = code
+            self.names[lookup][code] = name
+        return code
+
+    def decode(self, lookup: str, code):
+        """
+        Возвращает строковое значение по коду (неизвестный код перечитывает справочники из БД)
+        :param lookup: Имя справочника
+        :param code: Код значения
+        :return: Строковое значение (None для None)
+        """
+
+        if code is None:
+            return None
+        name = self.names[lookup].get(code)
+        if name is None and self.reload:
+            self.load()
+            name = self.names[lookup].get(code)
+        return name
+
+    def encode_row(self, table: str, row) -> list:
+        """
+        Заменяет строковые значения строки таблицы (в порядке COLUMNS) их кодами.
+        Нестроковые значения не кодируются повторно (коды одной БД в другой нужно сначала декодировать)
+        """
+        row = list(row)
+        for column, lookup in migrations.ENCODED_COLUMNS[table].items():
+            index = migrations.COLUMNS[table].index(column)
+            if isinstance(row[index], str):
+                row[index] = self.encode(lookup, row[index])
+        return row
+
+    def decode_row(self, table: str, row) -> list:
+        """Заменяет коды строки таблицы (в порядке COLUMNS) строковыми значениями"""
+        row = list(row)
+        for column, lookup in migrations.ENCODED_COLUMNS[table].items():
+            index = migrations.COLUMNS[table].index(column)
+            row[index] = self.decode(lookup, row[index])
+        return row
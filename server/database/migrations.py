@@ -0,0 +1,420 @@
+import time  # Библиотека для работы со временем
+from database import partitions  # Модуль для управления секциями таблиц
+
+
+# Схема таблиц версии 1: первичные ключи, индекс по дате, компактные типы колонок
+SUGAR_TABLE_V1 = """CREATE TABLE {table} (
+id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+value FLOAT,
+tendency VARCHAR(32),
+difference FLOAT,
+PRIMARY KEY (id),
+UNIQUE KEY uq_sugar_date (date)
+)"""
+
+INSULIN_TABLE_V1 = """CREATE TABLE {table} (
+id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+value FLOAT,
+carbs FLOAT,
+duration INT,
+type VARCHAR(32) NOT NULL,
+PRIMARY KEY (id),
+UNIQUE KEY uq_insulin_date_type (date, type)
+)"""
+
+DEVICE_TABLE_V1 = """CREATE TABLE {table} (
+id INT NOT NULL,
+date INT UNSIGNED NOT NULL,
+phone_battery TINYINT UNSIGNED,
+transmitter_battery TINYINT UNSIGNED,
+pump_battery TINYINT UNSIGNED,
+pump_cartridge SMALLINT UNSIGNED,
+insulin_date INT UNSIGNED,
+cannula_date INT UNSIGNED,
+sensor_date INT UNSIGNED,
+pump_name VARCHAR(64),
+phone_name VARCHAR(64),
+transmitter_name VARCHAR(64),
+insulin_name VARCHAR(64),
+sensor_name VARCHAR(64),
+PRIMARY KEY (id),
+KEY ix_device_date (date)
+)"""
+
+# Схема таблиц версии 3: коды справочников вместо строк, целочисленный сахар (мг/дл)
+SUGAR_TABLE_V3 = """CREATE TABLE {table} (
+id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+value SMALLINT UNSIGNED,
+tendency TINYINT UNSIGNED,
+difference SMALLINT,
+PRIMARY KEY (id),
+UNIQUE KEY uq_sugar_date (date)
+)"""
+
+INSULIN_TABLE_V3 = """CREATE TABLE {table} (
+id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+value FLOAT,
+carbs SMALLINT UNSIGNED,
+duration SMALLINT UNSIGNED,
+type TINYINT UNSIGNED NOT NULL,
+PRIMARY KEY (id),
+UNIQUE KEY uq_insulin_date_type (date, type)
+)"""
+
+DEVICE_TABLE_V3 = """CREATE TABLE {table} (
+id INT NOT NULL,
+date INT UNSIGNED NOT NULL,
+phone_battery TINYINT UNSIGNED,
+transmitter_battery TINYINT UNSIGNED,
+pump_battery TINYINT UNSIGNED,
+pump_cartridge SMALLINT UNSIGNED,
+insulin_date INT UNSIGNED,
+cannula_date INT UNSIGNED,
+sensor_date INT UNSIGNED,
+pump_name SMALLINT UNSIGNED,
+phone_name SMALLINT UNSIGNED,
+transmitter_name SMALLINT UNSIGNED,
+insulin_name SMALLINT UNSIGNED,
+sensor_name SMALLINT UNSIGNED,
+PRIMARY KEY (id),
+KEY ix_device_date (date)
+)"""
+
+# История состояния устройств: одна строка на каждое изменившееся поле (коды справочников - как в Device)
+DEVICE_HISTORY_TABLE = """CREATE TABLE {table} (
+id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+field VARCHAR(32) NOT NULL,
+value DOUBLE,
+PRIMARY KEY (id),
+KEY ix_device_history_field_date (field, date),
+KEY ix_device_history_date (date)
+)"""
+
+# Справочник строковых значений (date - момент появления значения, нужен для репликации и бекапа)
+LOOKUP_TABLE = """CREATE TABLE IF NOT EXISTS {table} (
+id SMALLINT UNSIGNED NOT NULL AUTO_INCREMENT,
+date INT UNSIGNED NOT NULL,
+name VARCHAR(64) NOT NULL,
+PRIMARY KEY (id),
+UNIQUE KEY uq_{table}_name (name)
+)"""
+
+# Справочники с известными заранее значениями (коды фиксированы и совпадают во всех БД)
+LOOKUP_SEEDS = {
+    "Tendency": [
+        "DoubleUp", "SingleUp", "FortyFiveUp", "Flat", "FortyFiveDown", "SingleDown", "DoubleDown",
+        "NOT COMPUTABLE", "RATE OUT OF RANGE", "NONE", ""
+    ],
+    "EventType": ["Temp Basal", "Carb Correction", "Correction Bolus"],
+    "DeviceName": []
+}
+
+# Колонки, хранящиеся кодами {таблица: {колонка: справочник}}
+ENCODED_COLUMNS = {
+    "Sugar": {"tendency": "Tendency"},
+    "Insulin": {"type": "EventType"},
+    "Device": {
+        "pump_name": "DeviceName",
+        "phone_name": "DeviceName",
+        "transmitter_name": "DeviceName",
+        "insulin_name": "DeviceName",
+        "sensor_name": "DeviceName"
+    }
+}
+
+# Агрегатная таблица сахара (одна строка на интервал bucket секунд)
+SUGAR_AGGREGATE_TABLE = """CREATE TABLE IF NOT EXISTS {table} (
+bucket INT UNSIGNED NOT NULL,
+mean FLOAT,
+min FLOAT,
+max FLOAT,
+count SMALLINT UNSIGNED NOT NULL,
+in_range SMALLINT UNSIGNED NOT NULL,
+PRIMARY KEY (bucket)
+)"""
+
+# Колонки таблиц (порядок совпадает с SELECT * в API)
+COLUMNS = {
+    "Sugar": ["id", "date", "value", "tendency", "difference"],
+    "Insulin": ["id", "date", "value", "carbs", "duration", "type"],
+    "Device": [
+        "id", "date",
+        "phone_battery", "transmitter_battery", "pump_battery", "pump_cartridge",
+        "insulin_date", "cannula_date", "sensor_date",
+        "pump_name", "phone_name", "transmitter_name", "insulin_name", "sensor_name"
+    ],
+    "Tendency": ["id", "date", "name"],
+    "EventType": ["id", "date", "name"],
+    "DeviceName": ["id", "date", "name"],
+    "DeviceHistory": ["id", "date", "field", "value"]
+}
+
+# Все таблицы данных (справочники первыми), используются при переносе, репликации, сверке и бекапе
+TABLES = ("Tendency", "EventType", "DeviceName", "Sugar", "Insulin", "Device", "DeviceHistory")
+
+
+def lookup_queries() -> list:
+    """Возвращает запросы создания справочников и записи известных значений с фиксированными кодами"""
+    queries = []
+    for table, names in LOOKUP_SEEDS.items():
+        queries.append(LOOKUP_TABLE.format(table=table))
+        if names:
+            values = ", ".join(f"({code}, 0, '{name}')" for code, name in enumerate(names, start=1))
+            queries.append(f"INSERT IGNORE INTO {table} (id, date, name) VALUES {values}")
+    return queries
+
+
+def encode_select(table: str) -> str:
+    """
+    Возвращает список выражений SELECT для переноса строк таблицы версии 1 в версию 3
+    (строки заменяются кодами справочников, сахар округляется до целого)
+    :param table: Имя таблицы
+    :return: Выражения через запятую в порядке COLUMNS
+    """
+
+    expressions = []
+    for column in COLUMNS[table]:
+        lookup = ENCODED_COLUMNS[table].get(column)
+        if lookup:
+            expressions.append(f"(SELECT id FROM {lookup} WHERE name = {table}.{column})")
+        elif (table, column) in (("Sugar", "value"), ("Sugar", "difference"), ("Insulin", "carbs")):
+            expressions.append(f"ROUND({column})")
+        else:
+            expressions.append(column)
+    return ", ".join(expressions)
+
+
+def collect_lookup_queries() -> list:
+    """Возвращает запросы заполнения справочников значениями, уже записанными в таблицах версии 1"""
+    queries = []
+    for table, columns in ENCODED_COLUMNS.items():
+        for column, lookup in columns.items():
+            queries.append(
+                f"INSERT IGNORE INTO {lookup} (date, name) "
+                f"SELECT UNIX_TIMESTAMP(), {column} FROM {table} WHERE {column} IS NOT NULL GROUP BY {column}"
+            )
+    return queries
+
+
+def device_history_seed_queries() -> list:
+    """Возвращает запросы записи текущего состояния устройств в историю (начальная точка истории)"""
+    return [
+        f"INSERT INTO DeviceHistory (date, field, value) SELECT date, '{column}', {column} FROM Device "
+        f"WHERE id = 0 AND {column} IS NOT NULL"
+        for column in COLUMNS['Device'][2:]
+    ]
+
+
+# Список миграций по порядку версий
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "Первичные ключи, индекс по дате и компактные типы колонок",
+        "rebuild": {
+            "Sugar": SUGAR_TABLE_V1,
+            "Insulin": INSULIN_TABLE_V1,
+            "Device": DEVICE_TABLE_V1
+        }
+    },
+    {
+        "version": 2,
+        "description": "Агрегатные таблицы сахара по 15 минут и по часу",
+        "queries": [
+            SUGAR_AGGREGATE_TABLE.format(table="Sugar_15m"),
+            SUGAR_AGGREGATE_TABLE.format(table="Sugar_1h")
+        ]
+    },
+    {
+        "version": 3,
+        "description": "Справочники вместо строковых колонок, целочисленный сахар",
+        "prepare": lookup_queries() + collect_lookup_queries(),
+        "rebuild": {
+            "Sugar": SUGAR_TABLE_V3,
+            "Insulin": INSULIN_TABLE_V3,
+            "Device": DEVICE_TABLE_V3
+        },
+        "select": {
+            "Sugar": encode_select("Sugar"),
+            "Insulin": encode_select("Insulin"),
+            "Device": encode_select("Device")
+        }
+    },
+    {
+        "version": 4,
+        "description": "История изменений состояния устройств",
+        "queries": [DEVICE_HISTORY_TABLE.format(table="DeviceHistory")] + device_history_seed_queries()
+    },
+    {
+        "version": 5,
+        "description": "Дробные значения в истории устройств",
+        "queries": ["ALTER TABLE DeviceHistory MODIFY value DOUBLE"]
+    }
+]
+
+# Актуальная схема таблиц (используется при создании новых таблиц)
+LATEST_TABLES = {
+    "Sugar": SUGAR_TABLE_V3,
+    "Insulin": INSULIN_TABLE_V3,
+    "Device": DEVICE_TABLE_V3,
+    "DeviceHistory": DEVICE_HISTORY_TABLE
+}
+
+
+class Migrator:
+    def __init__(self, db, chunk_size=5000):
+        """
+        Класс применения версионных миграций схемы БД
+        :param db: Объект БД (database.MySQL)
+        :param chunk_size: Кол-во строк, переносимых за один запрос при пересоздании таблицы
+        """
+
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def ensure_version_table(self) -> None:
+        """Создает таблицу с историей примененных миграций"""
+        self.db.execute_query(
+            query="""CREATE TABLE IF NOT EXISTS SchemaVersion (
+            version INT NOT NULL,
+            description VARCHAR(255),
+            applied_at INT UNSIGNED,
+            PRIMARY KEY (version)
+            )"""
+        )
+
+    def current_version(self) -> int:
+        """Возвращает номер последней примененной миграции (0 - миграции не применялись)"""
+        self.ensure_version_table()
+        result = self.db.execute_query(query="SELECT MAX(version) FROM SchemaVersion")
+        return result[0][0] or 0
+
+    def stamp(self, version=None) -> None:
+        """
+        Отмечает миграции примененными без их выполнения (для таблиц, созданных сразу по актуальной схеме)
+        :param version: Номер версии схемы (по умолчанию - последняя миграция)
+        :return: None
+        """
+
+        version = MIGRATIONS[-1]['version'] if version is None else version
+        self.ensure_version_table()
+        for migration in MIGRATIONS:
+            if migration['version'] <= version:
+                self.db.execute_query(
+                    query="INSERT IGNORE INTO SchemaVersion (version, description, applied_at) VALUES (%s, %s, %s)",
+                    params=[migration['version'], migration['description'], int(time.time())]
+                )
+
+    def table_exists(self, table: str) -> bool:
+        """Проверяет наличие таблицы в БД"""
+        result = self.db.execute_query(
+            query="SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+            params=[self.db.database, table]
+        )
+        return result[0][0] > 0
+
+    def rebuild_table(self, table: str, create_query: str, select=None) -> None:
+        """
+        Пересоздает таблицу по новой схеме с переносом данных порциями (дубликаты по ключам отбрасываются).
+        Секционированная таблица после подмены секционируется заново
+        :param table: Имя таблицы
+        :param create_query: Шаблон CREATE TABLE с полем {table}
+        :param select: Выражения SELECT для преобразования строк (по умолчанию колонки копируются как есть)
+        :return: None
+        """
+
+        new_table = f"{table}_migration"
+        old_table = f"{table}_old"
+        columns = ", ".join(COLUMNS[table])
+        select = select or columns
+
+        # Новая таблица создается сразу, если старой нет
+        if not self.table_exists(table):
+            self.db.execute_query(query=create_query.format(table=table))
+            print(f"\t{table}: таблица создана")
+            return
+
+        self.db.execute_query(query=f"DROP TABLE IF EXISTS {new_table}")
+        self.db.execute_query(query=create_query.format(table=new_table))
+
+        # Перенос данных порциями по возрастанию даты с отчетом о прогрессе
+        total = self.db.execute_query(query=f"SELECT COUNT(*) FROM {table}")[0][0]
+        copied = 0
+        last_date = -1
+        start_time = time.monotonic()
+        while True:
+            chunk = self.db.execute_query(
+                query=f"SELECT MAX(date), COUNT(*) FROM "
+                      f"(SELECT date FROM {table} WHERE date > %s ORDER BY date LIMIT %s) AS chunk",
+                params=[last_date, self.chunk_size]
+            )
+            chunk_end, chunk_count = chunk[0]
+            if not chunk_count:
+                break
+
+            self.db.execute_query(
+                query=f"INSERT IGNORE INTO {new_table} ({columns}) "
+                      f"SELECT {select} FROM {table} WHERE date > %s AND date <= %s",
+                params=[last_date, chunk_end]
+            )
+            last_date = chunk_end
+            copied += chunk_count
+
+            percent = round(copied / total * 100, 1) if total else 100
+            rate = round(copied / max(time.monotonic() - start_time, 1e-6))
+            print(f"\r\t{table}: {copied}/{total} строк ({percent}%, {rate} строк/сек)", end="")
+        print("")
+
+        # Атомарная подмена таблиц
+        manager = partitions.PartitionManager(self.db)
+        partitioned = manager.is_partitioned(table)
+        self.db.execute_query(query=f"RENAME TABLE {table} TO {old_table}, {new_table} TO {table}")
+        self.db.execute_query(query=f"DROP TABLE {old_table}")
+
+        kept = self.db.execute_query(query=f"SELECT COUNT(*) FROM {table}")[0][0]
+        print(f"\t{table}: перенесено {kept} строк, отброшено дубликатов - {total - kept}")
+
+        # Новая таблица создается без секций, поэтому секционирование включается повторно
+        if partitioned:
+            manager.enable(table)
+
+    def migrate(self) -> int:
+        """
+        Применяет все непримененные миграции по порядку
+        :return: Номер версии схемы после применения
+        """
+
+        version = self.current_version()
+        pending = [item for item in MIGRATIONS if item['version'] > version]
+        if not pending:
+            print(f"✅ Схема БД {self.db.database} актуальна (версия {version})")
+            return version
+
+        for migration in pending:
+            print(f"🔄 Миграция {migration['version']} БД {self.db.database} - {migration['description']}")
+
+            for query in migration.get('prepare', []):
+                self.db.execute_query(query=query)
+
+            for table, create_query in migration.get('rebuild', {}).items():
+                self.rebuild_table(
+                    table=table,
+                    create_query=create_query,
+                    select=migration.get('select', {}).get(table)
+                )
+
+            for query in migration.get('queries', []):
+                self.db.execute_query(query=query)
+
+            self.db.execute_query(
+                query="INSERT INTO SchemaVersion (version, description, applied_at) VALUES (%s, %s, %s)",
+                params=[migration['version'], migration['description'], int(time.time())]
+            )
+            version = migration['version']
+            print(f"✅ Миграция {version} применена")
+
+        return version
@@ -0,0 +1,178 @@
+from datetime import datetime, UTC  # Библиотека для работы с датой и временем
+
+
+# Таблицы, поддерживающие секционирование по дате
+PARTITIONED_TABLES = ("Sugar", "Insulin")
+
+
+def month_start(date: datetime) -> datetime:
+    """Возвращает начало месяца (UTC) для переданной даты"""
+    return datetime(date.year, date.month, 1, tzinfo=UTC)
+
+
+def next_month(date: datetime) -> datetime:
+    """Возвращает начало следующего месяца (UTC)"""
+    return datetime(date.year + date.month // 12, date.month % 12 + 1, 1, tzinfo=UTC)
+
+
+def partition_name(date: datetime) -> str:
+    """Возвращает имя секции месяца в формате pYYYYMM"""
+    return f"p{date.year}{date.month:02d}"
+
+
+class PartitionManager:
+    def __init__(self, db):
+        """
+        Класс управления помесячными секциями (RANGE по date) таблиц Sugar и Insulin
+        :param db: Объект БД (database.MySQL)
+        """
+
+        self.db = db
+
+    def partitions(self, table: str) -> list:
+        """
+        Функция получения списка секций таблицы
+        :param table: Имя таблицы
+        :return: Список [(имя секции, верхняя граница | 'MAXVALUE'), ...] по порядку
+        """
+
+        return [
+            (item[0], item[1])
+            for item in self.db.execute_query(
+                query="""SELECT partition_name, partition_description FROM information_schema.partitions
+                WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL
+                ORDER BY partition_ordinal_position""",
+                params=[self.db.database, table]
+            )
+        ]
+
+    def table_exists(self, table: str) -> bool:
+        """Проверяет наличие таблицы в БД"""
+        result = self.db.execute_query(
+            query="SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+            params=[self.db.database, table]
+        )
+        return result[0][0] > 0
+
+    def is_partitioned(self, table: str) -> bool:
+        """Проверяет, секционирована ли таблица"""
+        return len(self.partitions(table)) > 0
+
+    @staticmethod
+    def month_definitions(first: datetime, last: datetime) -> list:
+        """Возвращает описания секций для месяцев с first по last включительно"""
+        definitions = []
+        current = month_start(first)
+        while current <= last:
+            upper = next_month(current)
+            definitions.append(f"PARTITION {partition_name(current)} VALUES LESS THAN ({int(upper.timestamp())})")
+            current = upper
+        return definitions
+
+    def enable(self, table: str, months_ahead=3) -> None:
+        """
+        Функция включения секционирования таблицы (секции с первого месяца данных до текущего + months_ahead)
+        :param table: Имя таблицы (Sugar | Insulin)
+        :param months_ahead: Кол-во будущих секций
+        :return: None
+        """
+
+        if self.is_partitioned(table):
+            print(f"\t{table}: таблица уже секционирована")
+            return
+
+        # Ключ секционирования обязан входить в каждый уникальный ключ, поэтому date добавляется в первичный ключ
+        self.db.execute_query(query=f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, date)")
+
+        first_date = self.db.execute_query(query=f"SELECT MIN(date) FROM {table}")[0][0]
+        now = datetime.now(UTC)
+        first = datetime.fromtimestamp(first_date, UTC) if first_date else now
+        last = month_start(now)
+        for _ in range(months_ahead):
+            last = next_month(last)
+
+        definitions = self.month_definitions(first, last) + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+        self.db.execute_query(
+            query=f"ALTER TABLE {table} PARTITION BY RANGE (date) ({', '.join(definitions)})"
+        )
+        print(f"✅ {table}: создано секций - {len(definitions)}")
+
+    def ensure_future(self, table: str, months_ahead=3) -> None:
+        """
+        Функция создания будущих секций (разделение секции pmax), чтобы новые данные не попадали в pmax
+        :param table: Имя таблицы
+        :param months_ahead: Кол-во будущих секций относительно текущего месяца
+        :return: None
+        """
+
+        partitions = [item for item in self.partitions(table) if item[1] != 'MAXVALUE']
+        if not partitions:
+            return
+
+        first = datetime.fromtimestamp(int(partitions[-1][1]), UTC)
+        last = month_start(datetime.now(UTC))
+        for _ in range(months_ahead):
+            last = next_month(last)
+        if first > last:
+            return
+
+        definitions = self.month_definitions(first, last) + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+        self.db.execute_query(
+            query=f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})"
+        )
+        print(f"✅ {table}: добавлено будущих секций - {len(definitions) - 1}")
+
+    def archive(self, table: str, keep_months: int, detach=True) -> list:
+        """
+        Функция отсоединения старых секций (операция с метаданными вместо массового DELETE)
+        :param table: Имя таблицы
+        :param keep_months: Кол-во хранимых месяцев (включая текущий)
+        :param detach: True - перенос секции в отдельную таблицу {table}_{секция}, False - удаление секции
+        :return: Список обработанных секций
+        """
+
+        cutoff = month_start(datetime.now(UTC))
+        for _ in range(keep_months - 1):
+            cutoff = datetime(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1, tzinfo=UTC)
+        return self.archive_before(table, int(cutoff.timestamp()), detach)
+
+    def archive_before(self, table: str, cutoff: int, detach=True) -> list:
+        """
+        Функция отсоединения секций, все строки которых старше cutoff (секция, содержащая cutoff, не затрагивается)
+        :param table: Имя таблицы
+        :param cutoff: Граница (UNIX)
+        :param detach: True - перенос секции в отдельную таблицу {table}_{секция}, False - удаление секции
+        :return: Список обработанных секций
+        """
+
+        processed = []
+        for name, upper in self.partitions(table):
+            if upper == 'MAXVALUE' or int(upper) > cutoff:
+                continue
+
+            if detach:
+                archive_table = f"{table}_{name}"
+                if not self.table_exists(archive_table):
+                    # Обмен секции с пустой несекционированной таблицей той же структуры
+                    self.db.execute_query(query=f"CREATE TABLE {archive_table} LIKE {table}")
+                    self.db.execute_query(query=f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+                    self.db.execute_query(
+                        query=f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {archive_table}"
+                    )
+                else:
+                    # Архив месяца уже есть (секция создана заново, например после миграции) - строки дописываются
+                    self.db.execute_query(
+                        query=f"INSERT IGNORE INTO {archive_table} SELECT * FROM {table} PARTITION ({name})"
+                    )
+                print(f"\t{table}: секция {name} перенесена в таблицу {archive_table}")
+            self.db.execute_query(query=f"ALTER TABLE {table} DROP PARTITION {name}")
+            processed.append(name)
+
+        print(f"✅ {table}: обработано старых секций - {len(processed)}")
+        return processed
+
+    def maintain(self, months_ahead=3) -> None:
+        """Функция обслуживания: создает будущие секции для всех секционированных таблиц"""
+        for table in PARTITIONED_TABLES:
+            if self.is_partitioned(table):
+                self.ensure_future(table, months_ahead)
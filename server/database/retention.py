@@ -0,0 +1,165 @@
+import time  # Библиотека для работы со временем
+
+from database import partitions  # Модуль для управления секциями таблиц
+
+
+# Сколько дней хранятся исходные показания сахара (5 минут)
+RAW_DAYS = 90
+
+# Сколько дней хранятся 15-минутные агрегаты (часовые хранятся всегда)
+AGGREGATE_15M_DAYS = 730
+
+# Границы целевого диапазона сахара (time-in-range)
+RANGE_LOW = 70
+RANGE_HIGH = 180
+
+# Агрегатные таблицы {таблица: длина интервала (сек)}
+AGGREGATES = {
+    "Sugar_15m": 900,
+    "Sugar_1h": 3600
+}
+
+# Максимальная длина запрашиваемого периода (сек) для 15-минутных агрегатов
+AGGREGATE_15M_MAX_SPAN = 31 * 86400
+
+
+def pick_resolution(date_start: int, date_end: int, oldest_raw=None, now=None) -> str:
+    """
+    Функция выбора таблицы для запроса сахара по периоду.
+    Исходные показания выбираются всегда, пока они хранятся на начало периода, агрегаты - только для
+    периодов, начинающихся раньше самого старого исходного показания (удаленного политикой хранения)
+    :param date_start: Начало периода (UNIX)
+    :param date_end: Конец периода (UNIX)
+    :param oldest_raw: Дата самого старого исходного показания (MIN(date) таблицы Sugar)
+    :param now: Текущее время (UNIX), по умолчанию time.time()
+    :return: Имя таблицы (Sugar | Sugar_15m | Sugar_1h)
+    """
+
+    now = int(now or time.time())
+    if oldest_raw is None or date_start >= oldest_raw:
+        return "Sugar"
+    if date_end - date_start <= AGGREGATE_15M_MAX_SPAN and date_start >= now - AGGREGATE_15M_DAYS * 86400:
+        return "Sugar_15m"
+    return "Sugar_1h"
+
+
+class RetentionEngine:
+    def __init__(self, db, raw_days=RAW_DAYS, aggregate_days=AGGREGATE_15M_DAYS, chunk_size=5000):
+        """
+        Класс политики хранения: свертка исходных показаний в агрегаты и удаление устаревших строк
+        :param db: Объект БД (database.MySQL)
+        :param raw_days: Сколько дней хранить исходные показания
+        :param aggregate_days: Сколько дней хранить 15-минутные агрегаты
+        :param chunk_size: Кол-во строк, удаляемых одним запросом (короткие блокировки)
+        """
+
+        self.db = db
+        self.raw_days = raw_days
+        self.aggregate_days = aggregate_days
+        self.chunk_size = chunk_size
+        self.oldest_raw = None  # Дата самого старого исходного показания (для выбора таблицы запроса без обращения к БД)
+
+    def load_oldest(self) -> int | None:
+        """Функция чтения даты самого старого исходного показания (MIN(date) таблицы Sugar) в oldest_raw"""
+        self.oldest_raw = self.db.execute_query(query="SELECT MIN(date) FROM Sugar")[0][0]
+        return self.oldest_raw
+
+    def rollup(self, table: str, bucket: int, date_start=None, date_end=None) -> int:
+        """
+        Функция свертки исходных показаний в агрегатную таблицу.
+        По умолчанию пересчитываются интервалы начиная с последнего записанного (он мог быть неполным), повтор безопасен
+        :param table: Агрегатная таблица
+        :param bucket: Длина интервала (сек)
+        :param date_start: Пересчитать интервалы, начиная с интервала этой даты (UNIX)
+        :param date_end: Пересчитать интервалы до интервала этой даты включительно (UNIX, None - до последнего)
+        :return: Кол-во затронутых строк (обновленный интервал считается дважды)
+        """
+
+        if date_start is None:
+            date_start = self.db.execute_query(query=f"SELECT COALESCE(MAX(bucket), 0) FROM {table}")[0][0]
+        date_start -= date_start % bucket
+        date_end = 2 ** 32 if date_end is None else date_end - date_end % bucket + bucket
+        return self.db.execute_update(
+            query=f"""INSERT INTO {table} (bucket, mean, min, max, count, in_range)
+            SELECT date - date %% {bucket}, AVG(value), MIN(value), MAX(value), COUNT(*),
+            SUM(value BETWEEN %s AND %s)
+            FROM Sugar WHERE date >= %s AND date < %s GROUP BY 1
+            ON DUPLICATE KEY UPDATE mean = VALUES(mean), min = VALUES(min), max = VALUES(max),
+            count = VALUES(count), in_range = VALUES(in_range)""",
+            params=[RANGE_LOW, RANGE_HIGH, date_start, date_end]
+        )
+
+    def refresh(self, dates: list) -> None:
+        """
+        Функция пересчета агрегатов по записанным показаниям (вызывается после записи в Sugar, в т.ч. досылки)
+        :param dates: Даты записанных показаний (UNIX)
+        :return: None
+        """
+
+        if dates:
+            self.oldest_raw = min(dates) if self.oldest_raw is None else min(self.oldest_raw, min(dates))
+
+        # Интервалы старше границы удаления не пересчитываются: остальные показания интервала уже удалены
+        cutoff = (int(time.time()) - self.raw_days * 86400) // 3600 * 3600
+        dates = [date for date in dates if date >= cutoff]
+        if not dates:
+            return
+        for table, bucket in AGGREGATES.items():
+            self.rollup(table, bucket, min(dates), max(dates))
+
+    def catch_up(self) -> None:
+        """Функция досчета агрегатов по показаниям, записанным в обход API (с последнего интервала)"""
+        for table, bucket in AGGREGATES.items():
+            print(f"\t{table}: затронуто строк - {self.rollup(table, bucket)}")
+
+    def purge(self, table: str, column: str, cutoff: int) -> int:
+        """
+        Функция удаления строк старше cutoff порциями
+        :param table: Имя таблицы
+        :param column: Колонка с датой
+        :param cutoff: Граница удаления (UNIX, не включительно)
+        :return: Кол-во удаленных строк
+        """
+
+        deleted = 0
+        while True:
+            count = self.db.execute_update(
+                query=f"DELETE FROM {table} WHERE {column} < %s LIMIT %s",
+                params=[cutoff, self.chunk_size]
+            )
+            deleted += count
+            if count < self.chunk_size:
+                return deleted
+
+    def apply(self) -> dict:
+        """
+        Функция применения политики хранения: сначала свертка, затем удаление
+        (исходные строки удаляются только по границе целого часа, уже попавшего во все агрегаты)
+        :return: Статистика {"Sugar_15m": затронуто, "Sugar_1h": затронуто, "Sugar": удалено (список секций), ...}
+        """
+
+        stats = {}
+        for table, bucket in AGGREGATES.items():
+            stats[table] = self.rollup(table, bucket)
+            print(f"\t{table}: затронуто строк - {stats[table]}")
+
+        now = int(time.time())
+        raw_cutoff = (now - self.raw_days * 86400) // 3600 * 3600
+
+        # Секционированная таблица очищается целыми секциями (перенос в архивные таблицы, как --archive):
+        # месяц, в который попадает граница, хранится до истечения целиком
+        manager = partitions.PartitionManager(self.db)
+        if manager.is_partitioned("Sugar"):
+            stats['Sugar'] = manager.archive_before("Sugar", raw_cutoff)
+            print(f"\tSugar: секций старше {self.raw_days} дней перенесено в архив - {len(stats['Sugar'])}")
+        else:
+            stats['Sugar'] = self.purge("Sugar", "date", raw_cutoff)
+            print(f"\tSugar: удалено показаний старше {self.raw_days} дней - {stats['Sugar']}")
+
+        self.load_oldest()
+
+        stats['Sugar_15m_purged'] = self.purge("Sugar_15m", "bucket", now - self.aggregate_days * 86400)
+        print(f"\tSugar_15m: удалено интервалов старше {self.aggregate_days} дней - {stats['Sugar_15m_purged']}")
+
+        print("✅ Политика хранения применена")
+        return stats
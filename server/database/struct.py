@@ -1,19 +1,19 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Union
 
 
-# Структура Таблицы Sugar
+# Структура Таблицы Sugar (id выдается сервером, при записи игнорируется)
 class SugarData(BaseModel):
-    id: int
+    id: Optional[int] = None
     date: int
     value: float
     tendency: str
     difference: float
 
 
-# Структура Таблицы Insulin
+# Структура Таблицы Insulin (id выдается сервером, при записи игнорируется)
 class InsulinData(BaseModel):
-    id: int
+    id: Optional[int] = None
     date: int
     value: float
     carbs: float
@@ -39,6 +39,12 @@ class DeviceData(BaseModel):
     sensor_name: str
 
 
+# Структура изменившихся полей устройств (только поля, отличающиеся от последнего состояния)
+class DeviceChanges(BaseModel):
+    date: int
+    fields: dict[str, Union[int, float, str]]
+
+
 # Структура кастомных SQL запросов через API
 class CommandData(BaseModel):
     query: str
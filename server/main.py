@@ -5,6 +5,14 @@ import threading  # Библиотека для работы с параллел
 import logging  # Библиотека для работы с логированием
 from time import sleep  # Библиотека для работы с задержкой
 from reserve import reserve as res_db
+from reserve import runner as res_runner  # Модуль неинтерактивного переноса в Резервную БД
+from reserve import verify as res_verify  # Модуль сверки Основной и Резервной БД
+from reserve import backup as res_backup  # Модуль резервного копирования Основной БД
+from database import database  # Модуль для взаимодействия с БД
+from database import migrations  # Модуль для миграций схемы БД
+from database import partitions  # Модуль для управления секциями таблиц
+from database import retention  # Модуль политики хранения и агрегатов
+import config as cfg  # Настройки программы
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -42,17 +50,108 @@ def start():
         logger.info("Running parsing loop")
         parse.start_loop()
 
-    def reserve():
+    # Функция неинтерактивного переноса в Резервную БД (продолжает прерванный перенос)
+    def reserve(reset_db=False):
         logger.info("Running Reserver mode")
+        if not res_runner.start(reset_db=reset_db, resume=not reset_db):
+            logger.error("Reserver mode stopped, run --reserve again to resume")
+
+    # Функция интерактивного переноса через API (с изменением данных под новые стандарты)
+    def reserve_interactive():
+        logger.info("Running Reserver interactive mode")
         res_db.start()
 
+    # Функция прямого потокового переноса данных в Резервную БД
+    def reserve_stream():
+        logger.info("Running Reserver stream mode")
+        res_db.start_stream()
+
+    # Функция непрерывной репликации в Резервную БД
+    def reserve_loop():
+        logger.info("Running Reserver replication loop")
+        res_db.start_replication()
+
+    # Функция резервного копирования Основной БД в сжатые файлы
+    def run_backup(incremental=False):
+        logger.info("Running backup mode")
+        res_backup.backup(incremental=incremental)
+
+    # Функция восстановления Основной БД из резервных копий
+    def run_restore(paths=None):
+        logger.info("Running restore mode")
+        res_backup.restore(paths=paths or None)
+
+    # Функция подключения к БД по блоку настроек
+    def connect_db(db_cfg):
+        return database.MySQL(
+            host=db_cfg.host,
+            port=db_cfg.port,
+            user=getattr(db_cfg, db_cfg.sel_user).login,
+            password=getattr(db_cfg, db_cfg.sel_user).password,
+            database=db_cfg.database,
+            retry_max=db_cfg.retry_max,
+            retry_delay=db_cfg.retry_delay,
+            timeout=db_cfg.timeout,
+            read_timeout=db_cfg.read_timeout,
+            write_timeout=db_cfg.write_timeout
+        )
+
+    # Функция сверки Основной и Резервной БД по контрольным суммам
+    def reserve_verify(repair=False):
+        logger.info("Running Reserver verify mode")
+        res_verify.start(repair=repair)
+
+    # Функция применения миграций схемы к основной и резервной БД
+    def run_migrations():
+        logger.info("Running migrations")
+        for db_cfg in (cfg.DataBase, cfg.Reserve.Database):
+            db = connect_db(db_cfg)
+            migrations.Migrator(db).migrate()
+            db.close()
+
+    # Функция секционирования таблиц основной БД и (или) отсоединения старых секций
+    def run_partitions(enable=False, keep_months=None):
+        logger.info("Running partitions mode")
+        db = connect_db(cfg.DataBase)
+        manager = partitions.PartitionManager(db)
+        for table in partitions.PARTITIONED_TABLES:
+            if enable:
+                manager.enable(table)
+                manager.ensure_future(table)
+
+            # Архивация не включает секционирование: несекционированные таблицы пропускаются
+            if keep_months:
+                if manager.is_partitioned(table):
+                    manager.archive(table, keep_months=keep_months)
+                else:
+                    print(f"⚠️ {table}: таблица не секционирована, архивация пропущена (см. --partitions)")
+        db.close()
+
+    # Функция свертки старых показаний в агрегаты и удаления устаревших строк
+    def run_retention(raw_days=retention.RAW_DAYS):
+        logger.info("Running retention mode")
+        db = connect_db(cfg.DataBase)
+        retention.RetentionEngine(db, raw_days=raw_days).apply()
+        db.close()
+
     # Функция для вывода справочной информации
     def show_info():
         logger.info("Help table with command palette")
         print("\nСписок аргументов для запуска программы:\n"
               "1) --parse - Спарсить и сохранить данные\n"
               "2) --parseLoop - Бесконечный парсинг\n"
-              "3) --info - Вывод списка аргументов\n"
+              "3) --reserve - Перенос в резервную БД с продолжением после сбоя (--reserveReset - с нуля)\n"
+              "4) --reserveStream - Прямой потоковый перенос таблиц в резервную БД\n"
+              "5) --reserveLoop - Непрерывная репликация в резервную БД (новые строки и изменения за последний час, "
+              "удаления не копируются)\n"
+              "6) --verify - Сверка основной и резервной БД (--verifyRepair - с исправлением)\n"
+              "7) --migrate - Применить миграции схемы к основной и резервной БД\n"
+              "8) --partitions - Включить помесячные секции таблиц Sugar и Insulin\n"
+              "9) --archive N - Отсоединить секции старше N месяцев\n"
+              "10) --backup - Резервная копия основной БД (--backupInc - только новые записи)\n"
+              "11) --restore [ПУТЬ ...] - Восстановить основную БД из резервных копий\n"
+              "12) --retention [N] - Свернуть показания старше N дней в агрегаты и удалить их\n"
+              "13) --info - Вывод списка аргументов\n"
               )
 
     # Обработка входных команд при запуске
@@ -62,7 +161,23 @@ def start():
     parser.add_argument('--parse', action='store_true', help='Run parsing mode')
     parser.add_argument('--parseLoop', action='store_true', help='Run parsing loop')
     parser.add_argument('--api', action="store_true", help='Run API mode')
-    parser.add_argument('--reserve', action="store_true", help='Run move to reserve Database')
+    parser.add_argument('--reserve', action="store_true", help='Run move to reserve Database (headless, resumable)')
+    parser.add_argument('--reserveReset', action="store_true", help='Recreate reserve tables and move data from scratch')
+    parser.add_argument('--reserveInteractive', action="store_true", help='Run interactive move to reserve Database')
+    parser.add_argument('--reserveStream', action="store_true", help='Stream tables from main to reserve Database')
+    parser.add_argument('--reserveLoop', action="store_true",
+                        help='Continuous replication to reserve Database (new rows by id, in-place changes '
+                             'within the last hour; deletes are not replicated)')
+    parser.add_argument('--verify', action="store_true", help='Compare main and reserve Database by checksums')
+    parser.add_argument('--verifyRepair', action="store_true", help='Compare and repair reserve Database')
+    parser.add_argument('--migrate', action="store_true", help='Apply schema migrations to main and reserve Database')
+    parser.add_argument('--partitions', action="store_true", help='Enable monthly partitions of main Database')
+    parser.add_argument('--archive', type=int, default=None, help='Detach partitions older than N months')
+    parser.add_argument('--backup', action="store_true", help='Backup main Database to compressed files')
+    parser.add_argument('--backupInc', action="store_true", help='Incremental backup since the last backup')
+    parser.add_argument('--restore', nargs='*', default=None, help='Restore main Database from backups')
+    parser.add_argument('--retention', type=int, nargs='?', const=retention.RAW_DAYS, default=None,
+                        help='Roll up old sugar readings into aggregates and purge raw rows older than N days')
     parser.add_argument('--info', action='store_true', help='Help table with command palette')
 
     # Обрабатываем поднятые флаги
@@ -81,9 +196,36 @@ def start():
     if args.parseLoop:
         thread_parse_loop = threading.Thread(target=run_parsing_loop)
         threads.append(thread_parse_loop)
-    if args.reserve:
-        thread_reserve = threading.Thread(target=reserve)
+    if args.reserve or args.reserveReset:
+        thread_reserve = threading.Thread(target=reserve, args=(args.reserveReset, ))
         threads.append(thread_reserve)
+    if args.reserveInteractive:
+        thread_reserve_interactive = threading.Thread(target=reserve_interactive)
+        threads.append(thread_reserve_interactive)
+    if args.reserveStream:
+        thread_reserve_stream = threading.Thread(target=reserve_stream)
+        threads.append(thread_reserve_stream)
+    if args.reserveLoop:
+        thread_reserve_loop = threading.Thread(target=reserve_loop)
+        threads.append(thread_reserve_loop)
+    if args.verify or args.verifyRepair:
+        thread_verify = threading.Thread(target=reserve_verify, args=(args.verifyRepair, ))
+        threads.append(thread_verify)
+    if args.migrate:
+        thread_migrate = threading.Thread(target=run_migrations)
+        threads.append(thread_migrate)
+    if args.partitions or args.archive:
+        thread_partitions = threading.Thread(target=run_partitions, args=(args.partitions, args.archive))
+        threads.append(thread_partitions)
+    if args.backup or args.backupInc:
+        thread_backup = threading.Thread(target=run_backup, args=(args.backupInc, ))
+        threads.append(thread_backup)
+    if args.restore is not None:
+        thread_restore = threading.Thread(target=run_restore, args=(args.restore, ))
+        threads.append(thread_restore)
+    if args.retention is not None:
+        thread_retention = threading.Thread(target=run_retention, args=(args.retention, ))
+        threads.append(thread_retention)
     if args.info:
         thread_info = threading.Thread(target=show_info)
         threads.append(thread_info)
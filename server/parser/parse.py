@@ -1,11 +1,25 @@
 import requests  # Библиотека для отправки HTTP запросов
+from requests.adapters import HTTPAdapter  # Адаптер с пулом постоянных соединений
 import datetime  # Библиотека для работы с датой и временем
 from concurrent.futures import ThreadPoolExecutor  # Библиотека для работы с много поточностью
 from time import sleep  # Библиотека для работы с задержкой
 import json  # Библиотека для работы с JSON строками
+import os  # Библиотека для работы с операционной системой
 import config as cfg  # Настройки программы
 
 
+# Путь до файла с курсорами (watermark) последних загруженных записей NightScout
+WATERMARK_PATH = os.path.abspath(os.path.join(os.getcwd(), "watermark.json"))
+
+# Общая HTTP-сессия для NightScout: постоянные (keep-alive) соединения без повторного TLS-рукопожатия + сжатие gzip
+NIGHTSCOUT_SESSION = requests.Session()
+NIGHTSCOUT_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=3))
+NIGHTSCOUT_SESSION.headers.update({"accept": "application/json", "accept-encoding": "gzip, deflate"})
+
+# Последнее записанное состояние устройств {поле: значение} для поиска изменений без чтения БД
+DEVICE_STATE = {}
+
+
 # Аутентификация в API
 def auth_api():
     """Функция для авторизации пользователя и получения JWT токена"""
@@ -19,6 +33,44 @@ def auth_api():
         return False
 
 
+# Функция чтения курсоров последних загруженных записей
+def read_watermark() -> dict:
+    """
+    Функция чтения курсоров (watermark) последних загруженных записей по каждой коллекции NightScout
+    :return: Словарь вида {"sugar": unix, "insulin": unix, "device": unix}
+    """
+
+    try:
+        with open(WATERMARK_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Функция сохранения курсора последней загруженной записи
+def save_watermark(collection: str, date: int | None) -> None:
+    """
+    Функция сдвига курсора коллекции вперед (курсор никогда не уменьшается)
+    :param collection: Имя коллекции (sugar | insulin | device)
+    :param date: Дата последней сохраненной записи в UNIX формате
+    :return: None
+    """
+
+    if date is None:
+        return
+
+    watermark = read_watermark()
+    if date <= watermark.get(collection, 0):
+        return
+    watermark[collection] = int(date)
+
+    # Атомарная запись файла, чтобы обрыв программы не повредил курсоры
+    temp_path = f"{WATERMARK_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(watermark, f, indent=4)
+    os.replace(temp_path, WATERMARK_PATH)
+
+
 # Парсинг данных
 def parse_data():
     """
@@ -44,19 +96,63 @@ def parse_data():
         except ValueError as e:
             raise ValueError(f"Неверный формат даты: {iso_date_str}. Ожидается формат ISO 8601.") from e
 
+    def unix_to_iso(unix_date: int) -> str:
+        """
+        Преобразует UNIX дату (в секундах) в строку ISO 8601 (например, '2025-04-03T01:29:24Z')
+        :param unix_date: Timestamp в секундах.
+        :return: Дата в формате ISO 8601.
+        """
+
+        return datetime.datetime.fromtimestamp(unix_date, datetime.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
     def fetch_data(url_site: str) -> dict:
         """Функция для получения данных с сервера
         :param url_site: Адрес NightScout API для получения данных
         """
-        with requests.Session() as session:
-            try:
-                headers = {"accept": "application/json"}
-                response = session.get(url_site, headers=headers)
-                return response.json() if response.status_code == 200 else []
-            except Exception as e:
-                print(f"Ошибка при парсинге данных {url_site} - {e}")
+        try:
+            response = NIGHTSCOUT_SESSION.get(url_site)
+            if response.status_code != 200:
+                print(f"Ошибка при парсинге данных {url_site} - {response.status_code}")
+                return None
+            return response.json()
+        except Exception as e:
+            print(f"Ошибка при парсинге данных {url_site} - {e}")
+            return None
+
+    def fetch_pages(url_site: str, field: str, count: int) -> list | None:
+        """
+        Функция получения всех записей новее курсора постранично.
+        NightScout отдает только count самых новых записей (новые первыми), поэтому после перерыва дольше count
+        записей следующие страницы запрашиваются с верхней границей по самой старой полученной записи,
+        пока не придет неполная страница. При ошибке любой страницы возвращается None, чтобы курсор
+        не сдвинулся через непрочитанный промежуток
+        :param url_site: Адрес NightScout API с фильтром по курсору
+        :param field: Поле даты записи для верхней границы (date | created_at)
+        :param count: Размер страницы
+        :return: Записи от новых к старым или None
+        """
+
+        records = []
+        seen = set()
+        page_url = url_site
+        while True:
+            page = fetch_data(page_url)
+            if page is None:
                 return None
 
+            # Граница включительная (записи с одинаковой датой не теряются), повторы отбрасываются по _id
+            new_records = []
+            for item in page:
+                key = item.get('_id') or json.dumps(item, sort_keys=True)
+                if key not in seen:
+                    seen.add(key)
+                    new_records.append(item)
+            records.extend(new_records)
+
+            if len(page) < count or not new_records:
+                return records
+            page_url = f"{url_site}&find[{field}][$lte]={records[-1].get(field)}"
+
     def process_sugar_data(data_sugar: dict) -> dict:
         """
         Функция обработки данных сахаров
@@ -126,8 +222,13 @@ def parse_data():
             search_cartridge_pump = True
 
             device_data = {}
+            last_date = None
 
             for item in data_device:
+                # Поиск самой свежей записи для сдвига курсора
+                if item.get('created_at') is not None:
+                    item_date = iso_to_unix(item.get('created_at'))
+                    last_date = item_date if last_date is None else max(last_date, item_date)
 
                 if search_battery_pump:
                     if item.get('pump', {}).get('battery', {}).get('percent') is not None:
@@ -166,6 +267,10 @@ def parse_data():
             device_data['insulin_name'] = cfg.Parser.Setting.Names.insulin
             device_data['sensor_name'] = cfg.Parser.Setting.Names.sensor
 
+            # Курсор ставится только при наличии новых записей
+            if last_date is not None:
+                device_data['watermark'] = last_date
+
             return device_data
         except Exception as e:
             print(f"Ошибка при обработке данных устройств - {e}")
@@ -192,26 +297,43 @@ def parse_data():
                 "device": f"https://{url}/api/v1/devicestatus/?count={count}&token={token}"
             }
 
-            all_data = {}
-            with ThreadPoolExecutor():
-                # Выполняем запросы параллельно
-                results = {key: fetch_data(url) for key, url in urls.items() if url}
-
-                # Обрабатываем результаты запросов
-                if cfg.Parser.Setting.Search.sugar and results['sugar'] is not None:
-                    all_data["sugar"] = process_sugar_data(results["sugar"])
-                else:
-                    all_data['sugar'] = results['sugar']
-
-                if cfg.Parser.Setting.Search.insulin and results['insulin'] is not None:
-                    all_data["insulin"] = process_insulin_data(results["insulin"])
-                else:
-                    all_data['insulin'] = results['insulin']
+            # Запрашиваем все записи новее сохраненных курсоров постранично (при первом запуске - окно из count записей)
+            watermark = read_watermark()
+            fields = {"sugar": "date", "insulin": "created_at", "device": "created_at"}
+            if watermark.get('sugar') is not None:
+                # Последняя сохраненная запись запрашивается повторно как база для расчета разницы сахаров
+                urls['sugar'] += f"&find[date][$gte]={watermark['sugar'] * 1000}"
+            if watermark.get('insulin') is not None:
+                urls['insulin'] += f"&find[created_at][$gt]={unix_to_iso(watermark['insulin'])}"
+            if watermark.get('device') is not None:
+                urls['device'] += f"&find[created_at][$gt]={unix_to_iso(watermark['device'])}"
+
+            def fetch(key: str):
+                if watermark.get(key) is None:
+                    return fetch_data(urls[key])
+                return fetch_pages(urls[key], fields[key], count)
 
-                if cfg.Parser.Setting.Search.device and results['device'] is not None:
-                    all_data["device"] = process_device_data(results["device"])
-                else:
-                    all_data['device'] = results['device']
+            all_data = {}
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                # Выполняем запросы параллельно (время опроса = времени самого медленного запроса)
+                futures = {key: executor.submit(fetch, key) for key, url in urls.items() if url}
+                results = {key: future.result() for key, future in futures.items()}
+
+            # Обрабатываем результаты запросов
+            if cfg.Parser.Setting.Search.sugar and results['sugar'] is not None:
+                all_data["sugar"] = process_sugar_data(results["sugar"])
+            else:
+                all_data['sugar'] = results['sugar']
+
+            if cfg.Parser.Setting.Search.insulin and results['insulin'] is not None:
+                all_data["insulin"] = process_insulin_data(results["insulin"])
+            else:
+                all_data['insulin'] = results['insulin']
+
+            if cfg.Parser.Setting.Search.device and results['device'] is not None:
+                all_data["device"] = process_device_data(results["device"])
+            else:
+                all_data['device'] = results['device']
 
             return all_data
         except Exception as e:
@@ -224,261 +346,165 @@ def parse_data():
 # Функция записи новых данных сахаров в БД
 def write_sugar_data(data: dict, token: str) -> bool:
     """
-    Функция для цикличной записи данных сахаров в БД (MySQL)
+    Функция для цикличной записи данных сахаров в БД (MySQL).
+    Запись идемпотентна (уникальный ключ по дате), поэтому данные отправляются без предварительного чтения БД
     :param data: Новые JSON данные сахаров
     :param token: JWT-токен для обращения к API
     :return: Результат сохранения
     """
 
-    json_data = {
-        'query': "SELECT id, date, value FROM Sugar ORDER BY date DESC LIMIT 2",
-        'params': []
-    }
+    # Новых записей с момента последнего курсора нет
+    if not data:
+        return True
+
     main_url = cfg.Parser.API.main_url
     headers = {"Authorization": f"Bearer {token}"}
+    watermark = read_watermark().get('sugar')
 
-    # Получение старых записей в БД
+    # Сбор всех новых записей за цикл в один пакет
+    rows = []
     try:
-        url = f"{main_url}/put/command"
-        old_sugar_data = requests.put(url=url, json=json_data, headers=headers).json()
+        previous_value = None
+        for item in reversed(data):
+            # Записи без значения сахара (калибровки и т.д.) пропускаются
+            if item[1] is None:
+                continue
+
+            if watermark is None or item[0] > watermark:
+                # Первая запись без предыдущего значения при первом запуске служит только базой для разницы
+                if previous_value is not None:
+                    rows.append({
+                        'date': item[0],
+                        'value': float(item[1]),
+                        'tendency': item[3],
+                        'difference': round(item[1] - previous_value, 1)
+                    })
+                elif watermark is not None:
+                    rows.append({
+                        'date': item[0],
+                        'value': float(item[1]),
+                        'tendency': item[3],
+                        'difference': 0
+                    })
+
+            previous_value = item[1]
     except Exception as e:
-        old_sugar_data = {}
-        print(f"Ошибка получения старых данных сахаров - {e}")
+        print(f"Ошибка при генерации данных сахаров - {e}")
+        return False
 
-    # Проверка на наличие старых записей в БД
-    try:
-        if len(old_sugar_data[0]) >= 3:
-            bd_id = old_sugar_data[0][0]
-            bd_date = old_sugar_data[0][1]
-            bd_value = old_sugar_data[0][2]
-        else:
-            bd_id = 0
-            bd_date = None
-            bd_value = None
-    except Exception as e:
-        print(f"Ошибка получения старых данных сахаров - {e}")
-        bd_id = 0
-        bd_date = None
-        bd_value = None
+    if not rows:
+        return True
 
-    # Перебор полученных с API элементов
+    # Запись всех новых данных одним запросом
     try:
-        for item in reversed(data):
-            try:
-
-                # Проверка, что новый элемент моложе самого молодого объекта в БД
-                if bd_date and bd_id and bd_value and item[0] > bd_date:
-
-                    # Генерация нового id в формате xxxx:xxxx:xxxx
-                    bd_id += 1
-
-                    # Получение разницы с предыдущим сахаром
-                    difference = round(item[1] - bd_value, 1)
-                    difference = str(difference) if difference <= 0 else f"+{difference}"
-                    bd_value = item[1]
-
-                    # Запись новых данных в БД
-                    try:
-                        # Выпрямление данных
-                        date = item[0]
-                        value = float(item[1])
-                        tendency = item[3]
-
-                        # Запись данных
-                        params = {
-                            'id': bd_id,
-                            'date': date,
-                            'value': value,
-                            'tendency': tendency,
-                            'difference': difference
-                        }
-                        url = f"{main_url}/put/sugar"
-                        requests.put(url=url, json=params, headers=headers)
-                        return True
-
-                    except Exception as e:
-                        print(f"Ошибка сохранения данных сахара в БД - {e}")
-                        return False
-
-            except Exception as e:
-                print(f"Ошибка при генерации данных сахаров - {e}")
-                return False
-
+        url = f"{main_url}/put/sugar/batch"
+        response = requests.put(url=url, json=rows, headers=headers)
+        if response.status_code != 200:
+            print(f"Ошибка сохранения данных сахара в БД - {response.text}")
+            return False
+        save_watermark('sugar', max(row['date'] for row in rows))
         return True
-
     except Exception as e:
-        print(f"Ошибка при переборе данных сахаров - {e}")
+        print(f"Ошибка сохранения данных сахара в БД - {e}")
         return False
 
 
 # Функция записи новых данных инсулина и еды в БД
 def write_insulin_data(data: dict, token: str) -> bool:
     """
-    Функция для цикличной записи данных инсулина и еды в БД (MySQL)
+    Функция для цикличной записи данных инсулина и еды в БД (MySQL).
+    Запись идемпотентна (уникальный ключ по дате и типу), поэтому данные отправляются без предварительного чтения БД
     :param data: Новые JSON данные сахаров
     :param token: JWT-токен для обращения к API
     :return: Результат сохранения
     """
 
-    json_data = {
-        'query': "SELECT * FROM Insulin ORDER BY date DESC LIMIT 1",
-        'params': []
-    }
+    # Новых записей с момента последнего курсора нет
+    if not data:
+        return True
+
     headers = {"Authorization": f"Bearer {token}"}
     main_url = cfg.Parser.API.main_url
 
-    # Получение старых записей в БД
-    try:
-        url = f"{main_url}/put/command"
-        old_insulin_data = requests.put(url=url, json=json_data, headers=headers).json()
-        old_insulin_data = list(old_insulin_data[0])
-    except Exception as e:
-        old_insulin_data = []
-        print(f"Ошибка получения старых данных инсулина и еды - {e}")
-
-    # Проверка на наличие старых записей в БД
-    try:
-        if len(old_insulin_data) >= 2:
-            bd_id = old_insulin_data[0]
-            bd_date = old_insulin_data[1]
-        else:
-            bd_id = None
-            bd_date = None
-    except Exception as e:
-        print(f"Ошибка получения старых данных инсулина - {e}")
-        bd_id = None
-        bd_date = None
+    # Сбор всех новых записей за цикл в один пакет
+    rows = [
+        {
+            'date': item[0],
+            'value': item[1],
+            'carbs': item[2],
+            'duration': item[3],
+            'type': item[4]
+        }
+        for item in reversed(data)
+    ]
 
-    # Перебор полученных с API элементов
+    # Запись всех новых данных одним запросом
     try:
-        # Перебор полученных данных с NightScout
-        for item in reversed(data):
-            try:
-                # Сравнение дат последнего
-                if bd_id and bd_date and item[0] > bd_date:
-                    # Генерация нового id в формате xxxx:xxxx:xxxx
-                    bd_id += 1
-
-                    # Генерация новых данных
-                    actual_row = [
-                        bd_id,
-                        item[0],
-                        item[1],
-                        item[2],
-                        item[3],
-                        item[4]
-                    ]
-
-                    # Проверка на схождение данных
-                    if old_insulin_data[1::] == actual_row[1::]:
-                        continue
-
-                    # Попытка записи новых данных
-                    try:
-                        params = {
-                            'id': actual_row[0],
-                            'date': actual_row[1],
-                            'value': actual_row[2],
-                            'carbs': actual_row[3],
-                            'duration': actual_row[4],
-                            'type': actual_row[5]
-                        }
-                        url = f"{main_url}/put/insulin"
-                        requests.put(url=url, json=params, headers=headers)
-                        return True
-                    except Exception as e:
-                        print(f"Ошибка сохранения данных инсулина и еды - {e}")
-                        return False
-
-            except Exception as e:
-                print(f"Ошибка при генерации данных инсулина и еды - {e}")
-                return False
-
+        url = f"{main_url}/put/insulin/batch"
+        response = requests.put(url=url, json=rows, headers=headers)
+        if response.status_code != 200:
+            print(f"Ошибка сохранения данных инсулина и еды - {response.text}")
+            return False
+        save_watermark('insulin', max(row['date'] for row in rows))
         return True
-
     except Exception as e:
-        print(f"Ошибка перебора данных инсулина и еды - {e}")
+        print(f"Ошибка сохранения данных инсулина и еды - {e}")
         return False
 
 
 # Функция записи новых данных устройств в БД
 def write_device_data(data: dict, token: str) -> bool:
-    def comparison_data(new_data: dict, old_data: list) -> bool:
-        """
-        Функция для сравнения новых и старых данных
-        :param new_data: Словарь новых данных
-        :param old_data: Список старых данных
-        :return:
-        """
-
-        # Ключи, соответствующие данным в списке
-        keys = [
-            "id", "date",
-            "phone_battery", "transmitter_battery", "pump_battery", "pump_cartridge",
-            "insulin_date", "cannula_date", "sensor_date",
-            "pump_name", "phone_name", "transmitter_name", "insulin_name", "sensor_name"
-        ]
-
-        # Преобразование списка в словарь
-        old_data_dict = dict(zip(keys, old_data))
-
-        # Преобразование в JSON-строки для точного сравнения
-        old_json = json.dumps(old_data_dict, sort_keys=True)
-        new_json = json.dumps(new_data, sort_keys=True)
-
-        # Сравнение
-        return old_json != new_json
-
     """
-    Функция для цикличной записи данных устройств в БД (MySQL)
-    :param data: Новые JSON данные сахаров
+    Функция для цикличной записи данных устройств в БД (MySQL).
+    Новые данные сравниваются по полям с последним записанным состоянием в памяти (DEVICE_STATE),
+    на сервер отправляются только изменившиеся поля (они же дописываются в историю DeviceHistory)
+    :param data: Новые JSON данные устройств
     :param token: JWT-токен для обращения к API
     :return: Результат сохранения
     """
 
+    # Новых записей с момента последнего курсора нет
+    if 'watermark' not in data:
+        return True
+
+    headers = {"Authorization": f"Bearer {token}"}
+    main_url = cfg.Parser.API.main_url
+
     try:
-        # Получение последних данных устройств из БД
-        json_data = {
-            'query': "SELECT * FROM Device",
-            'params': []
-        }
-        headers = {"Authorization": f"Bearer {token}"}
-        main_url = cfg.Parser.API.main_url
-
-        url = f'{main_url}/put/command'
-        old_device_data = requests.put(url=url, json=json_data, headers=headers).json()
-        result = list(old_device_data[0])
-
-        # Генерация запроса
-        params = {
-            "id": 0,
-            "date": data['date'],
-            "phone_battery": data['battery_phone'],
-            "transmitter_battery": data['battery_transmitter'],
-            "pump_battery": data['battery_pump'],
-            "pump_cartridge": data['cartridge_pump'],
-            "insulin_date": result[6],
-            "cannula_date": result[7],
-            "sensor_date": result[8],
+        # Последнее состояние читается из БД один раз за время работы парсера
+        if not DEVICE_STATE:
+            response = requests.get(url=f"{main_url}/get/device/last", headers=headers)
+            if response.status_code == 200:
+                DEVICE_STATE.update(response.json())
+
+        # При инкрементальной загрузке часть полей может отсутствовать - они не изменились
+        new_state = {
+            "phone_battery": data.get('battery_phone'),
+            "transmitter_battery": data.get('battery_transmitter'),
+            "pump_battery": data.get('battery_pump'),
+            "pump_cartridge": data.get('cartridge_pump'),
             "pump_name": data['pump_name'],
             "phone_name": data['phone_name'],
             "transmitter_name": data['transmitter_name'],
             "insulin_name": data['insulin_name'],
             "sensor_name": data['sensor_name']
         }
+        changes = {
+            field: value
+            for field, value in new_state.items()
+            if value is not None and DEVICE_STATE.get(field) != value
+        }
 
-        # Обновление данных в таблице
-        if len(result) > 0:
-            # Проверка на отличие новых данные от старых
-            if comparison_data(old_data=result, new_data=params):
-                url = f'{main_url}/post/device'
-                requests.post(url=url, json=params, headers=headers).json()
-
-        # Запись данных в пустую таблицу
-        else:
-            url = f'{main_url}/put/device'
-            requests.put(url=url, json=params, headers=headers).json()
+        if changes:
+            url = f'{main_url}/post/device/changes'
+            body = {"date": data.get('date', data['watermark']), "fields": changes}
+            response = requests.post(url=url, json=body, headers=headers)
+            if response.status_code != 200:
+                print(f"Ошибка сохранения данных устройств - {response.text}")
+                return False
+            DEVICE_STATE.update(changes)
 
+        save_watermark('device', data['watermark'])
         return True
 
     except Exception as e:
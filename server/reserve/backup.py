@@ -0,0 +1,261 @@
+from reserve import reserve  # Модуль для работы с Резервной БД
+from database.database import MySQL  # Класс для работы с БД
+from database import migrations  # Модуль со схемой таблиц
+from concurrent.futures import ThreadPoolExecutor  # Библиотека для параллельного выполнения
+from datetime import datetime  # Библиотека для работы с датой и временем
+import gzip  # Библиотека для сжатия файлов
+import json  # Библиотека для работы с JSON строками
+import os  # Библиотека для работы с операционной системой
+import time  # Библиотека для работы со временем
+
+
+# Каталог с резервными копиями
+BACKUP_DIR = os.path.abspath(os.path.join(os.getcwd(), "backups"))
+
+# Имя файла описания резервной копии
+MANIFEST_NAME = "manifest.json"
+
+# Таблицы, строки которых изменяются на месте (Device - одна строка id=0), в каждую копию выгружаются целиком
+FULL_TABLES = ("Device",)
+
+# Окно (сек) повторной выгрузки строк по дате в инкрементальной копии (изменения на месте недавних строк Insulin)
+OVERLAP = 3600
+
+
+def read_manifest(path: str) -> dict:
+    """
+    Функция чтения описания резервной копии
+    :param path: Каталог резервной копии
+    :return: Описание {"created", "since", "tables": {таблица: {"columns", "files", "rows", "high_id",
+    "high_watermark"}}}
+    """
+
+    with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """
+    Функция атомарной записи описания (копия без описания считается незавершенной)
+    :param path: Каталог резервной копии
+    :param manifest: Описание резервной копии
+    :return: None
+    """
+
+    temp_path = os.path.join(path, f"{MANIFEST_NAME}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(temp_path, os.path.join(path, MANIFEST_NAME))
+
+
+def list_backups() -> list:
+    """Возвращает каталоги завершенных резервных копий (с описанием) по порядку создания"""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    return [
+        os.path.join(BACKUP_DIR, item)
+        for item in sorted(os.listdir(BACKUP_DIR))
+        if os.path.exists(os.path.join(BACKUP_DIR, item, MANIFEST_NAME))
+    ]
+
+
+def dump_table(connection, table: str, path: str, since_id: int | None, since_date: int | None, high_id: int,
+               high_watermark: int, file_rows=50000, compress_level=6) -> dict:
+    """
+    Функция выгрузки таблицы в сжатые файлы порциями (JSON-строка на запись)
+    :param connection: Соединение с согласованным снимком Основной БД (MySQL.snapshot)
+    :param table: Имя таблицы
+    :param path: Каталог резервной копии
+    :param since_id: Выгружать записи с id > since_id (новые строки, в т.ч. досылки с давними датами)
+    :param since_date: Выгружать записи с date > since_date (без since_id и since_date - полная копия)
+    :param high_id: Максимальный id таблицы в снимке (граница следующей инкрементальной копии)
+    :param high_watermark: Максимальная date таблицы в снимке
+    :param file_rows: Кол-во строк в одном файле
+    :param compress_level: Уровень сжатия gzip (1 - быстрее, 9 - меньше)
+    :return: Описание таблицы для manifest
+    """
+
+    columns = migrations.COLUMNS[table]
+    files = []
+    rows_total = 0
+    start_time = time.monotonic()
+
+    # Условия объединяются через OR: строка выгружается, если она новая по id или попадает в окно по дате
+    conditions = []
+    params = []
+    if since_id is not None:
+        conditions.append("id > %s")
+        params.append(since_id)
+    if since_date is not None:
+        conditions.append("date > %s")
+        params.append(since_date)
+    where = f" WHERE {' OR '.join(conditions)}" if conditions else ""
+
+    stream = MySQL.stream_rows(
+        connection,
+        query=f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id",
+        params=params,
+        chunk_size=file_rows
+    )
+    for rows in stream:
+        name = f"{table}.{len(files) + 1:04d}.jsonl.gz"
+        with gzip.open(os.path.join(path, name), "wt", encoding="utf-8", compresslevel=compress_level) as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n")
+        files.append(name)
+        rows_total += len(rows)
+
+    seconds = time.monotonic() - start_time
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in files)
+    print(f"\t{table}: {rows_total} строк, файлов - {len(files)}, {round(size / 1024)} КБ, "
+          f"{round(rows_total / max(seconds, 1e-6))} строк/сек")
+
+    return {
+        "columns": columns,
+        "files": files,
+        "rows": rows_total,
+        "bytes": size,
+        "high_id": high_id,
+        "high_watermark": high_watermark,
+        "seconds": round(seconds, 3)
+    }
+
+
+# Функция резервного копирования Основной БД
+def backup(tables=migrations.TABLES, incremental=False, since=None, file_rows=50000,
+           compress_level=6) -> str:
+    """
+    Функция резервного копирования таблиц Основной БД в сжатые файлы.
+    Все таблицы выгружаются через одно соединение с согласованным снимком, поэтому копия соответствует
+    одному моменту времени.
+    Инкрементальная копия содержит строки с id больше максимального id предыдущей копии (новые строки, в т.ч.
+    досылки с давними датами) и строки с date в окне OVERLAP от ее последней даты (недавние изменения на месте).
+    Изменения на месте более старых строк и удаления в инкрементальную копию не попадают - для них нужна полная копия.
+    Таблицы FULL_TABLES выгружаются целиком и в инкрементальную копию (их строки изменяются на месте)
+    :param tables: Список таблиц
+    :param incremental: Выгрузить только записи, добавленные после последней резервной копии
+    :param since: Выгрузить записи с date > since (UNIX), приоритетнее incremental
+    :param file_rows: Кол-во строк в одном файле
+    :param compress_level: Уровень сжатия gzip
+    :return: Путь до каталога резервной копии
+    """
+
+    base = {}
+    if since is None and incremental:
+        backups = list_backups()
+        if backups:
+            previous = read_manifest(backups[-1])
+            base = {
+                table: (item.get('high_id'), item['high_watermark'] - OVERLAP)
+                for table, item in previous['tables'].items()
+            }
+            print(f"🔄 Инкрементальная копия относительно {os.path.basename(backups[-1])}")
+        else:
+            print("⚠️ Предыдущих резервных копий нет, создается полная копия")
+
+    source_db = reserve.connect_main_db()
+    try:
+        kind = "full" if since is None and not base else "inc"
+        path = os.path.join(BACKUP_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{kind}")
+        os.makedirs(path, exist_ok=True)
+
+        start_time = time.monotonic()
+        with source_db.snapshot() as connection:
+            # Границы всех таблиц читаются из того же снимка, что и данные
+            with connection.cursor() as cursor:
+                high_watermarks = {}
+                for table in tables:
+                    cursor.execute(f"SELECT COALESCE(MAX(id), -1), COALESCE(MAX(date), 0) FROM {table}")
+                    high_watermarks[table] = cursor.fetchone()
+
+            # Нижние границы (id, date): полная копия - без границ, явная дата - только по date
+            bounds = {
+                table: (None, None) if table in FULL_TABLES else (None, since) if since is not None
+                else base.get(table, (None, None))
+                for table in tables
+            }
+
+            result = {
+                table: dump_table(
+                    connection, table, path, *bounds[table], *high_watermarks[table], file_rows, compress_level
+                )
+                for table in tables
+            }
+        seconds = time.monotonic() - start_time
+    finally:
+        source_db.close()
+
+    save_manifest(path, {
+        "created": int(time.time()),
+        "kind": kind,
+        "since": bounds,
+        "tables": result
+    })
+
+    rows = sum(item['rows'] for item in result.values())
+    size = sum(item['bytes'] for item in result.values())
+    print(f"✅ Резервная копия {path}: {rows} строк, {round(size / 1024)} КБ за {round(seconds, 2)} сек "
+          f"({round(rows / max(seconds, 1e-6))} строк/сек)")
+    return path
+
+
+def load_file(target_db, table: str, path: str, name: str, columns: list, chunk_size=5000) -> int:
+    """
+    Функция загрузки одного файла копии в таблицу (запись с обновлением, повтор загрузки безопасен)
+    :return: Кол-во загруженных строк
+    """
+
+    with gzip.open(os.path.join(path, name), "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if rows:
+        target_db.insert_many(
+            table=table,
+            columns=columns,
+            rows=rows,
+            chunk_size=chunk_size,
+            update_columns=columns[1:]
+        )
+    return len(rows)
+
+
+# Функция восстановления БД из резервной копии
+def restore(paths=None, to_reserve=False, workers=4, chunk_size=5000) -> int:
+    """
+    Функция параллельного восстановления таблиц из резервных копий
+    :param paths: Каталоги копий по порядку применения (None - последняя полная копия и все инкрементальные после нее)
+    :param to_reserve: Восстановить в Резервную БД вместо Основной
+    :param workers: Кол-во параллельных загрузчиков
+    :param chunk_size: Кол-во строк в одном INSERT
+    :return: Кол-во загруженных строк
+    """
+
+    if paths is None:
+        backups = list_backups()
+        full = [item for item in backups if read_manifest(item)['kind'] == "full"]
+        if not full:
+            print("❌ Полных резервных копий не найдено")
+            return 0
+        paths = backups[backups.index(full[-1]):]
+
+    target_db = reserve.connect_reserve_db() if to_reserve else reserve.connect_main_db()
+    loaded = 0
+    start_time = time.monotonic()
+    try:
+        # Копии применяются строго по порядку, файлы внутри одной копии загружаются параллельно
+        for path in paths:
+            manifest = read_manifest(path)
+            print(f"🔄 Восстановление из {path}")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(load_file, target_db, table, path, name, item['columns'], chunk_size)
+                    for table, item in manifest['tables'].items()
+                    for name in item['files']
+                ]
+                loaded += sum(future.result() for future in futures)
+    finally:
+        target_db.close()
+
+    seconds = time.monotonic() - start_time
+    print(f"✅ Восстановлено {loaded} строк за {round(seconds, 2)} сек ({round(loaded / max(seconds, 1e-6))} строк/сек)")
+    return loaded
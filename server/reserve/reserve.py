@@ -1,10 +1,48 @@
 from database.database import MySQL
+from database import migrations
+from database import lookup
+from concurrent.futures import ThreadPoolExecutor  # Библиотека для работы с много поточностью
 import requests
 from datetime import datetime
+from time import sleep  # Библиотека для работы с задержкой
+import time  # Библиотека для работы со временем
 import config as cfg
 
 
+# Функция создания обработчика прогресса записи
+def progress_printer(table: str, inline=True):
+    """
+    Функция создания обработчика для вывода прогресса записи в консоль
+    :param table: Имя таблицы
+    :param inline: Обновлять одну строку (False - новая строка на каждую порцию, для параллельной записи)
+    :return: Функция progress(записано, всего, строк/сек)
+    """
+
+    def progress(written: int, total: int | None, rate: float) -> None:
+        if not inline:
+            print(f"\t{table}: {written}/{total or '?'} - {round(rate)} строк/сек")
+            return
+        if total:
+            eta = int((total - written) / rate) if rate else 0
+            print(f"\r\t{table}: {written}/{total} ({round(written / total * 100, 1)}%) - "
+                  f"{round(rate)} строк/сек, осталось {eta // 60:02d}:{eta % 60:02d}", end="")
+        else:
+            print(f"\r\t{table}: {written} - {round(rate)} строк/сек", end="")
+        if total and written >= total:
+            print("")
+
+    return progress
+
+
 class ReserveDB(MySQL):
+    @property
+    def codes(self) -> lookup.LookupCodes:
+        """Коды справочников Резервной БД (строковые значения записываются кодами)"""
+        if getattr(self, '_codes', None) is None:
+            self._codes = lookup.LookupCodes(self)
+            self._codes.load()
+        return self._codes
+
     def reset_tables(self, sugar: bool, insulin: bool, device: bool) -> None:
         """
         Функция удаления таблиц (Сброса БД)
@@ -15,13 +53,15 @@ class ReserveDB(MySQL):
         """
 
         if sugar:
-            query = "DROP TABLE Sugar"
+            query = "DROP TABLE IF EXISTS Sugar"
             self.execute_query(query=query, params=[])
         if insulin:
-            query = "DROP TABLE Insulin"
+            query = "DROP TABLE IF EXISTS Insulin"
             self.execute_query(query=query, params=[])
         if device:
-            query = "DROP TABLE Device"
+            query = "DROP TABLE IF EXISTS Device"
+            self.execute_query(query=query, params=[])
+            query = "DROP TABLE IF EXISTS DeviceHistory"
             self.execute_query(query=query, params=[])
 
     def create_table(self, sugar: bool, insulin: bool, device: bool) -> None:
@@ -33,43 +73,32 @@ class ReserveDB(MySQL):
         :return: None
         """
 
+        # Таблицы создаются по актуальной схеме миграций, справочники - всегда (сбросом не удаляются)
+        migrator = migrations.Migrator(self)
+        version = migrator.current_version()
+        for query in migrations.lookup_queries():
+            self.execute_query(query=query, params=[])
         if sugar:
-            query = """CREATE TABLE Sugar (
-            id INT,
-            date INT,
-            value FLOAT,
-            tendency TEXT,
-            difference FLOAT
-            )"""
+            query = migrations.LATEST_TABLES['Sugar'].format(table="Sugar")
             self.execute_query(query=query, params=[])
         if insulin:
-            query = """CREATE TABLE Insulin (
-            id INT,
-            date INT,
-            value FLOAT,
-            carbs INT,
-            duration INT,
-            type TEXT
-            )"""
+            query = migrations.LATEST_TABLES['Insulin'].format(table="Insulin")
             self.execute_query(query=query, params=[])
         if device:
-            query = """CREATE TABLE Device (
-            id INT,
-            date INT,
-            phone_battery INT,
-            transmitter_battery INT,
-            pump_battery INT,
-            pump_cartridge INT,
-            insulin_date INT,
-            cannula_date INT,
-            sensor_date INT,
-            pump_name TEXT,
-            phone_name TEXT,
-            transmitter_name TEXT,
-            insulin_name TEXT,
-            sensor_name TEXT
-            )"""
+            query = migrations.LATEST_TABLES['Device'].format(table="Device")
             self.execute_query(query=query, params=[])
+            if not migrator.table_exists("DeviceHistory"):
+                query = migrations.LATEST_TABLES['DeviceHistory'].format(table="DeviceHistory")
+                self.execute_query(query=query, params=[])
+
+        # Таблицы созданы по последней схеме, поэтому версия схемы отмечается сразу (иначе --migrate
+        # применит миграции к уже актуальным таблицам). Если остались таблицы старой схемы, версия не меняется
+        created = {"Sugar": sugar, "Insulin": insulin, "Device": device}
+        legacy = [table for table, flag in created.items() if not flag and migrator.table_exists(table)]
+        if version < migrations.MIGRATIONS[-1]['version'] and legacy:
+            print(f"⚠️ Таблицы {legacy} в схеме версии {version}, выполните python main.py --migrate")
+        else:
+            migrator.stamp()
 
     def add_sugar(self, data: list) -> None:
         """
@@ -79,7 +108,7 @@ class ReserveDB(MySQL):
         """
 
         query = f"INSERT INTO {self.database}.Sugar VALUES (%s, %s, %s, %s, %s)"
-        self.execute_query(query=query, params=data)
+        self.execute_query(query=query, params=self.codes.encode_row("Sugar", data))
 
     def add_insulin(self, data) -> None:
         """
@@ -89,7 +118,43 @@ class ReserveDB(MySQL):
         """
 
         query = f"INSERT INTO {self.database}.Insulin VALUES (%s, %s, %s, %s, %s, %s)"
-        self.execute_query(query=query, params=data)
+        self.execute_query(query=query, params=self.codes.encode_row("Insulin", data))
+
+    def add_sugar_many(self, data, chunk_size=1000, total=None) -> dict:
+        """
+        Функция пакетной записи данных сахаров (многострочный INSERT, одна транзакция на порцию)
+        :param data: Список (или итератор) строк, итератор записывается порциями без сборки списка
+        :param chunk_size: Кол-во строк в одной порции
+        :param total: Общее кол-во строк (для отчета о прогрессе, если data - итератор)
+        :return: Статистика записи
+        """
+
+        return self.insert_many(
+            table=f"{self.database}.Sugar",
+            columns=migrations.COLUMNS['Sugar'],
+            rows=(self.codes.encode_row("Sugar", row) for row in data),
+            chunk_size=chunk_size,
+            total=len(data) if total is None and hasattr(data, '__len__') else total,
+            progress=progress_printer("Sugar")
+        )
+
+    def add_insulin_many(self, data, chunk_size=1000, total=None) -> dict:
+        """
+        Функция пакетной записи данных инсулина (многострочный INSERT, одна транзакция на порцию)
+        :param data: Список (или итератор) строк, итератор записывается порциями без сборки списка
+        :param chunk_size: Кол-во строк в одной порции
+        :param total: Общее кол-во строк (для отчета о прогрессе, если data - итератор)
+        :return: Статистика записи
+        """
+
+        return self.insert_many(
+            table=f"{self.database}.Insulin",
+            columns=migrations.COLUMNS['Insulin'],
+            rows=(self.codes.encode_row("Insulin", row) for row in data),
+            chunk_size=chunk_size,
+            total=len(data) if total is None and hasattr(data, '__len__') else total,
+            progress=progress_printer("Insulin")
+        )
 
     def add_device(self, data) -> None:
         """
@@ -99,101 +164,291 @@ class ReserveDB(MySQL):
         """
 
         query = f"INSERT INTO {self.database}.Device VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
-        self.execute_query(query=query, params=data)
+        self.execute_query(query=query, params=self.codes.encode_row("Device", data))
+
+
+# Функция подключения к Основной БД
+def connect_main_db() -> MySQL:
+    return MySQL(
+        host=cfg.DataBase.host,
+        port=cfg.DataBase.port,
+        user=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.login"),
+        password=eval(f"cfg.DataBase.{cfg.DataBase.sel_user}.password"),
+        database=cfg.DataBase.database,
+        retry_max=cfg.DataBase.retry_max,
+        retry_delay=cfg.DataBase.retry_delay,
+        timeout=cfg.DataBase.timeout,
+        read_timeout=cfg.DataBase.read_timeout,
+        write_timeout=cfg.DataBase.write_timeout
+    )
+
+
+# Функция подключения к Резервной БД
+def connect_reserve_db() -> ReserveDB:
+    return ReserveDB(
+        host=cfg.Reserve.Database.host,
+        port=cfg.Reserve.Database.port,
+        user=eval(f"cfg.Reserve.Database.{cfg.Reserve.Database.sel_user}.login"),
+        password=eval(f"cfg.Reserve.Database.{cfg.Reserve.Database.sel_user}.password"),
+        database=cfg.Reserve.Database.database,
+        retry_max=cfg.Reserve.Database.retry_max,
+        retry_delay=cfg.Reserve.Database.retry_delay,
+        timeout=cfg.Reserve.Database.timeout,
+        read_timeout=cfg.Reserve.Database.read_timeout,
+        write_timeout=cfg.Reserve.Database.write_timeout
+    )
+
+
+# Функция потокового копирования таблицы из Основной БД в Резервную
+def stream_table(source_db: MySQL, reserve_db: ReserveDB, table: str, chunk_size=5000, inline=True) -> dict:
+    """
+    Функция потокового копирования таблицы напрямую между БД (серверный курсор, память ограничена порцией)
+    :param source_db: Основная БД
+    :param reserve_db: Резервная БД
+    :param table: Имя таблицы (Sugar | Insulin | Device)
+    :param chunk_size: Кол-во строк в одной порции чтения и записи
+    :param inline: Обновлять строку прогресса (False - для параллельного копирования)
+    :return: Статистика записи
+    """
+
+    columns = migrations.COLUMNS[table]
+    total = source_db.execute_query(query=f"SELECT COUNT(*) FROM {table}")[0][0]
+    chunks = source_db.stream_query(
+        query=f"SELECT {', '.join(columns)} FROM {table} ORDER BY id",
+        chunk_size=chunk_size
+    )
+
+    # Запись с обновлением совпадающих строк, поэтому повторное копирование безопасно
+    return reserve_db.insert_many(
+        table=table,
+        columns=columns,
+        rows=(row for chunk in chunks for row in chunk),
+        chunk_size=chunk_size,
+        update_columns=columns[1:],
+        total=total,
+        progress=progress_printer(table, inline=inline)
+    )
+
+
+# Функция потокового переноса таблиц напрямую из Основной БД в Резервную
+def start_stream(tables=migrations.TABLES, chunk_size=5000, parallel=True, reset_db=False):
+    """
+    Функция переноса данных напрямую между БД, минуя API (каждая таблица в отдельном потоке)
+    :param tables: Список переносимых таблиц
+    :param chunk_size: Кол-во строк в одной порции
+    :param parallel: Копировать таблицы параллельно
+    :param reset_db: Пересоздать таблицы Резервной БД перед копированием
+    :return: Статистика записи по таблицам
+    """
+
+    source_db = connect_main_db()
+    reserve_db = connect_reserve_db()
+
+    if reset_db:
+        flags = {"sugar": "Sugar" in tables, "insulin": "Insulin" in tables, "device": "Device" in tables}
+        reserve_db.reset_tables(**flags)
+        reserve_db.create_table(**flags)
+
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+            futures = {
+                table: executor.submit(stream_table, source_db, reserve_db, table, chunk_size, False)
+                for table in tables
+            }
+            results = {table: future.result() for table, future in futures.items()}
+    else:
+        results = {table: stream_table(source_db, reserve_db, table, chunk_size) for table in tables}
+
+    for table, stats in results.items():
+        print(f"✅ {table}: перенесено {stats['rows']} строк за {stats['seconds']} сек ({stats['rows_per_sec']} строк/сек)")
+
+    source_db.close()
+    reserve_db.close()
+    return results
+
+
+# Функция одного цикла инкрементальной репликации
+def replicate_once(source_db: MySQL, reserve_db: ReserveDB, watermarks: dict, overlap=3600, chunk_size=5000) -> dict:
+    """
+    Функция копирования новых и измененных строк из Основной БД в Резервную.
+    Новые строки определяются по id (AUTO_INCREMENT выдается при записи, поэтому досылки с давними датами тоже
+    копируются), измененные на месте (Device, Insulin по (date, type)) - по окну overlap от последней даты.
+    Изменения строк с датой старше окна и удаления (в т.ч. политикой хранения) не реплицируются
+    :param source_db: Основная БД
+    :param reserve_db: Резервная БД
+    :param watermarks: Словарь {таблица: (последний скопированный id, последняя скопированная дата)}, обновляется на месте
+    :param overlap: Окно повторного копирования (сек) для поздних изменений уже скопированных строк
+    :param chunk_size: Кол-во строк в одной порции
+    :return: Кол-во новых строк (id больше предыдущей отметки) по таблицам, строки окна overlap не учитываются
+    """
+
+    copied = {}
+    for table, (last_id, last_date) in watermarks.items():
+        columns = migrations.COLUMNS[table]
+        chunks = source_db.stream_query(
+            query=f"SELECT {', '.join(columns)} FROM {table} WHERE id > %s OR date >= %s ORDER BY id",
+            params=[last_id, max(last_date - overlap, 0)],
+            chunk_size=chunk_size
+        )
+
+        # Отслеживание максимальных id и даты и кол-ва новых строк при потоковой записи
+        marks = [last_id, last_date]
+        new_rows = [0]
+
+        def rows():
+            for chunk in chunks:
+                for row in chunk:
+                    marks[0] = max(marks[0], row[0])
+                    marks[1] = max(marks[1], row[1])
+                    new_rows[0] += row[0] > last_id
+                    yield row
+
+        reserve_db.insert_many(
+            table=table,
+            columns=columns,
+            rows=rows(),
+            chunk_size=chunk_size,
+            update_columns=columns[1:]
+        )
+        watermarks[table] = (marks[0], marks[1])
+        copied[table] = new_rows[0]
+    return copied
+
+
+# Функция непрерывной репликации в Резервную БД
+def start_replication(tables=migrations.TABLES, interval=5, overlap=3600, chunk_size=5000):
+    """
+    Функция непрерывной инкрементальной репликации (без сброса таблиц и повторного копирования истории).
+    Ограничения (изменения старых строк и удаления не копируются) описаны в replicate_once
+    :param tables: Список реплицируемых таблиц
+    :param interval: Пауза между циклами (сек)
+    :param overlap: Окно повторного копирования (сек) для поздних изменений уже скопированных строк
+    :param chunk_size: Кол-во строк в одной порции
+    :return: None
+    """
+
+    source_db = connect_main_db()
+    reserve_db = connect_reserve_db()
+
+    # Начальная точка каждой таблицы - последние id и дата в Резервной БД
+    watermarks = {
+        table: tuple(reserve_db.execute_query(
+            query=f"SELECT COALESCE(MAX(id), -1), COALESCE(MAX(date), 0) FROM {table}"
+        )[0])
+        for table in tables
+    }
+    print(f"🔄 Репликация запущена, начальные отметки (id, date) - {watermarks}")
+
+    while True:
+        try:
+            copied = replicate_once(source_db, reserve_db, watermarks, overlap, chunk_size)
+            lag = int(datetime.now().timestamp()) - max(item[1] for item in watermarks.values())
+            if any(copied.values()):
+                print(f"\tСкопировано новых строк - {copied}, отставание последней записи - {lag} сек")
+        except Exception as e:
+            print(f"Ошибка репликации в Резервную БД - {e}")
+
+        sleep(interval)
 
 
 # Класс отвечающий за редактирование данных
 class EditData:
-    # Функция конвертации времени в unix формат
+    # Функция конвертации времени в unix формат (часовой пояс - локальный, как у datetime.timestamp)
     @staticmethod
     def date_to_unix(date_str: str) -> int:
-        return int(datetime.strptime(date_str, "%Y-%m-%d-%H-%M").timestamp())
+        # Разбор строки "%Y-%m-%d-%H-%M" через split вместо strptime (в разы быстрее на больших объемах)
+        year, month, day, hour, minute = date_str.split("-")
+        return int(time.mktime((int(year), int(month), int(day), int(hour), int(minute), 0, 0, 0, -1)))
 
     # Функция конвертации идентификатора (xxxx:xxxx:xxxx) в число
     @staticmethod
     def id_to_int(str_id: str) -> int:
-        data = str_id.split(":")
-        return int(f"{data[0]}{data[1]}{data[2]}")
+        return int(str_id.replace(":", ""))
 
     # Функция конвертации разницы сахара в число
     @staticmethod
     def difference_to_float(str_diff: str) -> float:
         return float(str_diff)
 
-    # Функция изменения данных сахара
-    def sugars(self, old_data: list) -> list:
+    # Функция потокового изменения данных сахара
+    def sugars_stream(self, old_data, chunk_size=5000):
         """
-        Список переменных для выравнивания (изменения) данных под новую БД
-        sugar_data - Изначальный список со старой БД
-        sugar_data_change_1 - Список с измененными датами (строка -> unix-формат (часовой пояс - 0))
-        sugar_data_change_2 - Список с измененными id (строка -> int)
-        sugar_data_change_3 - Список с измененными difference (строка -> float)
-        sugar_data_change_4 - Список с измененными значениями сахара (mmol/литр -> грамм/литр)
-        sugar_data_change_5 - Список с откорректированными значениями разницы между сахарами
+        Генератор порций измененных данных сахара (все преобразования за один проход по каждой строке)
+        :param old_data: Список (или итератор) строк старой БД
+        :param chunk_size: Кол-во строк в одной порции
+        :return: Генератор порций строк новой БД
 
         Необходимые изменения в БД:
         id (str -> int)
-        date (str -> int)
-        difference (str -> float)
-        sugar -> value
+        date (str -> int, unix-формат)
+        sugar -> value (mmol/литр -> грамм/литр)
+        difference (str -> float, mmol/литр -> грамм/литр)
         """
 
-        # Перевод дат в UNIX формат
-        sugar_data_change_1 = []
-        for item in old_data:
-            sugar_data_change_1.append([item[0], self.date_to_unix(item[1]), item[2], item[3], item[4]])
+        date_to_unix = self.date_to_unix
+        id_to_int = self.id_to_int
+        difference_to_float = self.difference_to_float
 
-        # Перевод ID в INT-формат
-        sugar_data_change_2 = []
-        for item in sugar_data_change_1:
-            sugar_data_change_2.append([self.id_to_int(item[0]), item[1], item[2], item[3], item[4]])
-
-        # Перевод Difference в INT-формат
-        sugar_data_change_3 = []
-        for item in sugar_data_change_2:
-            sugar_data_change_3.append([item[0], item[1], item[2], item[3], self.difference_to_float(item[4])])
-
-        # Перевод сахаров в формат грамм/литр
-        sugar_data_change_4 = []
-        for item in sugar_data_change_3:
-            sugar_data_change_4.append([item[0], item[1], int(item[2] * 18), item[3], item[4]])
+        chunk = []
+        for item in old_data:
+            chunk.append([
+                id_to_int(item[0]),
+                date_to_unix(item[1]),
+                int(item[2] * 18),
+                item[3],
+                round(difference_to_float(item[4]) * 18, 0)
+            ])
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
-        # Перевод разницы между сахарами в формат грамм/литр
-        sugar_data_change_5 = []
-        for item in sugar_data_change_4:
-            sugar_data_change_5.append([item[0], item[1], item[2], item[3], round(item[4] * 18, 0)])
+    # Функция изменения данных сахара
+    def sugars(self, old_data: list) -> list:
+        """
+        Функция изменения данных сахара под новую БД (см. sugars_stream)
+        :param old_data: Список строк старой БД
+        :return: Список строк новой БД
+        """
 
-        return sugar_data_change_5
+        return [row for chunk in self.sugars_stream(old_data) for row in chunk]
 
-    # Функция изменения данных инсулина
-    def insulin(self, old_data: list) -> list:
+    # Функция потокового изменения данных инсулина
+    def insulin_stream(self, old_data, chunk_size=5000):
         """
-        Список переменных для выравнивания (изменения) данных под новую БД
-        insulin_data - Изначальный список со старой БД
-        insulin_data_change_1 - Список с измененными датами (строка -> unix-формат (часовой пояс - 0))
-        insulin_data_change_2 - Список с измененными id (строка -> int)
+        Генератор порций измененных данных инсулина (все преобразования за один проход по каждой строке)
+        :param old_data: Список (или итератор) строк старой БД
+        :param chunk_size: Кол-во строк в одной порции
+        :return: Генератор порций строк новой БД
 
         Необходимые изменения в БД:
         id (str -> int)
-        date (str -> int)
+        date (str -> int, unix-формат)
         insulin -> value
         """
 
-        # Перевод дат в UNIX формат
-        insulin_data_change_1 = []
+        date_to_unix = self.date_to_unix
+        id_to_int = self.id_to_int
+
+        chunk = []
         for item in old_data:
-            insulin_data_change_1.append(
-                [item[0], self.date_to_unix(item[1]), item[2], item[3], item[4], item[5]]
-            )
+            chunk.append([id_to_int(item[0]), date_to_unix(item[1]), item[2], item[3], item[4], item[5]])
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
-        # Перевод ID в INT-формат
-        insulin_data_change_2 = []
-        for item in insulin_data_change_1:
-            insulin_data_change_2.append(
-                [self.id_to_int(item[0]), item[1], item[2], item[3], item[4], item[5]]
-            )
+    # Функция изменения данных инсулина
+    def insulin(self, old_data: list) -> list:
+        """
+        Функция изменения данных инсулина под новую БД (см. insulin_stream)
+        :param old_data: Список строк старой БД
+        :return: Список строк новой БД
+        """
 
-        return insulin_data_change_2
+        return [row for chunk in self.insulin_stream(old_data) for row in chunk]
 
     # Функция изменения данных устройств
     def device(self, old_data: list) -> list:
@@ -270,6 +525,7 @@ class GetData:
         self.api_password = cfg.Parser.API.user_password
         self.api_token = self.auth_api()
         self.headers = {"Authorization": f"Bearer {self.api_token}"}
+        self.lookups = None  # Справочники Основной БД {справочник: {код: значение}}, загружаются при первом коде
 
     def auth_api(self) -> str | bool:
         """Функция для авторизации пользователя и получения JWT токена"""
@@ -297,23 +553,48 @@ class GetData:
         data = requests.put(url=url, json=json_data, headers=self.headers).json()
         return data
 
+    def decode_row(self, table: str, row: list) -> list:
+        """
+        Заменяет коды справочников Основной БД строковыми значениями
+        (коды в Основной и Резервной БД могут различаться, в Резервной БД значения кодируются заново)
+        :param table: Имя таблицы
+        :param row: Строка в порядке COLUMNS
+        :return: Строка со строковыми значениями
+        """
+
+        row = list(row)
+        for column, lookup in migrations.ENCODED_COLUMNS[table].items():
+            index = migrations.COLUMNS[table].index(column)
+            if isinstance(row[index], int):
+                if self.lookups is None:
+                    self.lookups = {
+                        name: {item[0]: item[1] for item in self.get_data_from_api(
+                            query=f"SELECT id, name FROM {name}", params=[]
+                        )}
+                        for name in migrations.LOOKUP_SEEDS
+                    }
+                row[index] = self.lookups[lookup][row[index]]
+        return row
+
     def get_sugar_data(self, count: int) -> list:
-        return self.get_data_from_api(
+        rows = self.get_data_from_api(
             query=f"SELECT * FROM Sugar ORDER BY id DESC LIMIT {count}",
             params=[]
         )
+        return [self.decode_row("Sugar", row) for row in rows]
 
     def get_insulin_data(self, count: int) -> list:
-        return self.get_data_from_api(
+        rows = self.get_data_from_api(
             query=f"SELECT * FROM Insulin ORDER BY id DESC LIMIT {count}",
             params=[]
         )
+        return [self.decode_row("Insulin", row) for row in rows]
 
     def get_device_data(self) -> list:
-        return self.get_data_from_api(
+        return self.decode_row("Device", self.get_data_from_api(
             query="SELECT * FROM Device",
             params=[]
-        )[0]
+        )[0])
 
 
 def show_old_and_new_data(old_json_data: dict, new_json_data: dict) -> None:
@@ -344,10 +625,12 @@ def show_old_and_new_data(old_json_data: dict, new_json_data: dict) -> None:
 
 
 # Универсальный старт модуля
-def start(count=40000, sugar=True, insulin=True, device=True, edit_mode=False, save_mode=True, reset_db=True, create_db=True):
+def start(count=40000, sugar=True, insulin=True, device=True, edit_mode=False, save_mode=True, reset_db=True, create_db=True,
+          chunk_size=1000):
     """
     Универсальная функция переноса данных в Резервную БД
     :param count: Кол-во переносимых данных из таблицы sugar и insulin
+    :param chunk_size: Кол-во строк, записываемых одной транзакцией
     :param sugar: Перенос сахара
     :param insulin: Переноса инсулина и еды
     :param device: Перенос устройств
@@ -369,17 +652,19 @@ def start(count=40000, sugar=True, insulin=True, device=True, edit_mode=False, s
     insulin_data = data_manager.get_insulin_data(count=count) if insulin else None
     device_data = data_manager.get_device_data() if device else None
 
-    # Изменение данных под новые стандарты
+    # Изменение данных под новые стандарты. Сахар и инсулин преобразуются потоково при записи,
+    # для сравнения преобразуются только первые строки (preview)
+    preview = 10
     edit_manager = EditData() if edit_mode else None
-    new_sugar_data = edit_manager.sugars(old_data=sugar_data) if sugar and edit_mode else None
-    new_insulin_data = edit_manager.insulin(old_data=insulin_data) if insulin and edit_mode else None
+    new_sugar_data = edit_manager.sugars(old_data=sugar_data[:preview]) if sugar and edit_mode else None
+    new_insulin_data = edit_manager.insulin(old_data=insulin_data[:preview]) if insulin and edit_mode else None
     new_device_data = edit_manager.device(old_data=device_data) if device and edit_mode else None
 
     # Вывод сравнительных данных
     show_old_and_new_data(
         old_json_data={
-            "sugar": sugar_data,
-            "insulin": insulin_data,
+            "sugar": sugar_data[:preview] if sugar else None,
+            "insulin": insulin_data[:preview] if insulin else None,
             "device": device_data
         },
         new_json_data={
@@ -390,18 +675,7 @@ def start(count=40000, sugar=True, insulin=True, device=True, edit_mode=False, s
     )
 
     # Подключение к Резервной БД (MySQL)
-    reserve_db = ReserveDB(
-        host=cfg.Reserve.Database.host,
-        port=cfg.Reserve.Database.port,
-        user=eval(f"cfg.Reserve.Database.{cfg.Reserve.Database.sel_user}.login"),
-        password=eval(f"cfg.Reserve.Database.{cfg.Reserve.Database.sel_user}.password"),
-        database=cfg.Reserve.Database.database,
-        retry_max=cfg.Reserve.Database.retry_max,
-        retry_delay=cfg.Reserve.Database.retry_delay,
-        timeout=cfg.Reserve.Database.timeout,
-        read_timeout=cfg.Reserve.Database.read_timeout,
-        write_timeout=cfg.Reserve.Database.write_timeout
-    )
+    reserve_db = connect_reserve_db()
 
     # Проверка на согласие удалять таблицы
     test = str(input("Хотите начать процесс сброса таблиц? (YES/NO) - ")).upper()
@@ -438,29 +712,31 @@ def start(count=40000, sugar=True, insulin=True, device=True, edit_mode=False, s
 
         # Запись данных сахара
         if sugar:
-            # Получение финальных данных
-            sugar_write = new_sugar_data if edit_mode else sugar_data
+            # Получение финальных данных (строки в порядке возрастания id, преобразование - порциями при записи)
+            sugar_write = reversed(sugar_data)
+            if edit_mode:
+                sugar_write = (row for chunk in edit_manager.sugars_stream(sugar_write, chunk_size) for row in chunk)
 
             # Финальный вопрос перед записью данных
             final_test = str(input("Записать данные сахаров в Резервную БД? (YES/NO) - ")).upper()
             if final_test == "YES" or final_test == "Y":
-                for item in reversed(sugar_write):  # Перебор элементов в списке
-                    reserve_db.add_sugar(item)  # Запись данных в Резервную БД
-                print("\t" + "Запись сахаров - УСПЕШНА", end="\n\n")
+                stats = reserve_db.add_sugar_many(sugar_write, chunk_size=chunk_size, total=len(sugar_data))
+                print("\t" + f"Запись сахаров - УСПЕШНА ({stats['rows']} строк за {stats['seconds']} сек)", end="\n\n")
             else:
                 print("\t" + "Записать сахаров - ОТМЕНЕНА", end="\n\n")
 
         # Запись данных инсулина
         if insulin:
-            # Получение финальных данных
-            insulin_write = new_insulin_data if edit_mode else insulin_data
+            # Получение финальных данных (строки в порядке возрастания id, преобразование - порциями при записи)
+            insulin_write = reversed(insulin_data)
+            if edit_mode:
+                insulin_write = (row for chunk in edit_manager.insulin_stream(insulin_write, chunk_size) for row in chunk)
 
             # Финальный вопрос перед записью данных
             final_test = str(input("Записать данные инсулина в Резервную БД? (YES/NO) - ")).upper()
             if final_test == "YES" or final_test == "Y":
-                for item in reversed(insulin_write):  # Перебор элементов в списке
-                    reserve_db.add_insulin(item)  # Запись данных в Резервную БД
-                print("\t" + "Запись инсулина - УСПЕШНА", end="\n\n")
+                stats = reserve_db.add_insulin_many(insulin_write, chunk_size=chunk_size, total=len(insulin_data))
+                print("\t" + f"Запись инсулина - УСПЕШНА ({stats['rows']} строк за {stats['seconds']} сек)", end="\n\n")
             else:
                 print("\t" + "Запись инсулина - ОТМЕНЕНА", end="\n\n")
 
@@ -0,0 +1,139 @@
+from reserve import reserve  # Модуль для работы с Резервной БД
+from database import migrations  # Модуль со схемой таблиц
+import json  # Библиотека для работы с JSON строками
+import os  # Библиотека для работы с операционной системой
+import time  # Библиотека для работы со временем
+
+
+# Путь до файла с контрольными точками переноса
+CHECKPOINT_PATH = os.path.abspath(os.path.join(os.getcwd(), "reserve_checkpoint.json"))
+
+
+def read_checkpoint() -> dict:
+    """
+    Функция чтения контрольных точек переноса
+    :return: Словарь вида {таблица: {"last_id", "chunk", "copied", "done"}}
+    """
+
+    try:
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checkpoint(state: dict) -> None:
+    """
+    Функция атомарной записи контрольных точек (обрыв программы не повреждает файл)
+    :param state: Словарь контрольных точек
+    :return: None
+    """
+
+    temp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(temp_path, CHECKPOINT_PATH)
+
+
+def clear_checkpoint() -> None:
+    """Функция удаления контрольных точек после успешного переноса"""
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+
+def copy_table(source_db, reserve_db, table: str, state: dict, chunk_size=5000) -> None:
+    """
+    Функция переноса таблицы порциями по возрастанию id с записью контрольной точки после каждой порции
+    :param source_db: Основная БД
+    :param reserve_db: Резервная БД
+    :param table: Имя таблицы
+    :param state: Словарь контрольных точек (обновляется на месте)
+    :param chunk_size: Кол-во строк в одной порции
+    :return: None
+    """
+
+    columns = migrations.COLUMNS[table]
+    checkpoint = state.setdefault(table, {"last_id": -1, "chunk": 0, "copied": 0, "done": False})
+    if checkpoint['done']:
+        print(f"\t{table}: уже перенесена, пропуск")
+        return
+    if checkpoint['chunk']:
+        print(f"\t{table}: продолжение с id > {checkpoint['last_id']} (порция {checkpoint['chunk']})")
+
+    total = source_db.execute_query(query=f"SELECT COUNT(*) FROM {table}")[0][0]
+    start_time = time.monotonic()
+    copied_now = 0
+    while True:
+        rows = source_db.execute_query(
+            query=f"SELECT {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+            params=[checkpoint['last_id'], chunk_size]
+        )
+        if not rows:
+            break
+
+        # Порция записывается одной транзакцией, повтор порции после сбоя безопасен (запись с обновлением)
+        reserve_db.insert_many(
+            table=table,
+            columns=columns,
+            rows=rows,
+            chunk_size=chunk_size,
+            update_columns=columns[1:]
+        )
+
+        checkpoint['last_id'] = rows[-1][0]
+        checkpoint['chunk'] += 1
+        checkpoint['copied'] += len(rows)
+        save_checkpoint(state)
+
+        copied_now += len(rows)
+        rate = copied_now / max(time.monotonic() - start_time, 1e-6)
+        print(f"\t{table}: {checkpoint['copied']}/{total} - порция {checkpoint['chunk']}, {round(rate)} строк/сек")
+
+    checkpoint['done'] = True
+    save_checkpoint(state)
+    print(f"✅ {table}: перенесено {checkpoint['copied']} строк")
+
+
+# Функция неинтерактивного переноса данных в Резервную БД
+def start(tables=migrations.TABLES, chunk_size=5000, reset_db=False, resume=True) -> bool:
+    """
+    Функция неинтерактивного (без TTY) переноса данных в Резервную БД с продолжением после сбоя.
+    Подходит для запуска из cron или `main.py --reserve`
+    :param tables: Список переносимых таблиц
+    :param chunk_size: Кол-во строк в одной порции
+    :param reset_db: Пересоздать таблицы Резервной БД (только при новом переносе, не при продолжении)
+    :param resume: Продолжить с последней контрольной точки
+    :return: Результат переноса
+    """
+
+    state = read_checkpoint() if resume else {}
+    if not resume:
+        clear_checkpoint()
+
+    source_db = reserve.connect_main_db()
+    reserve_db = reserve.connect_reserve_db()
+
+    try:
+        # Таблицы пересоздаются только при новом переносе, продолжение никогда не удаляет данные
+        if not state and reset_db:
+            flags = {"sugar": "Sugar" in tables, "insulin": "Insulin" in tables, "device": "Device" in tables}
+            reserve_db.reset_tables(**flags)
+
+        # Недостающие таблицы (новая Резервная БД или сброс) создаются по актуальной схеме с отметкой версии
+        migrator = migrations.Migrator(reserve_db)
+        missing = [table for table in tables if not migrator.table_exists(table)]
+        if missing:
+            print(f"\tСоздание таблиц Резервной БД - {missing}")
+            reserve_db.create_table(sugar="Sugar" in missing, insulin="Insulin" in missing, device="Device" in missing)
+
+        for table in tables:
+            copy_table(source_db, reserve_db, table, state, chunk_size)
+
+        clear_checkpoint()
+        return True
+    except Exception as e:
+        print(f"Ошибка переноса в Резервную БД, прогресс сохранен в {CHECKPOINT_PATH} - {e}")
+        return False
+    finally:
+        source_db.close()
+        reserve_db.close()
@@ -0,0 +1,163 @@
+from reserve import reserve  # Модуль для работы с Резервной БД
+from database import migrations  # Модуль со схемой таблиц
+
+
+def row_hash(table: str) -> str:
+    """
+    Функция построения SQL-выражения контрольной суммы строки
+    :param table: Имя таблицы
+    :return: Выражение CRC32 по всем колонкам (NULL кодируется отдельно от пустой строки)
+    """
+
+    columns = ", ".join(f"COALESCE({item}, '\\\\N')" for item in migrations.COLUMNS[table])
+    return f"CRC32(CONCAT_WS('#', {columns}))"
+
+
+class Verifier:
+    def __init__(self, source_db, reserve_db, chunk_size=10000, leaf_size=100):
+        """
+        Класс сверки таблиц Основной и Резервной БД по контрольным суммам диапазонов id (суммы считаются в БД)
+        :param source_db: Основная БД
+        :param reserve_db: Резервная БД
+        :param chunk_size: Размер диапазона id верхнего уровня
+        :param leaf_size: Размер диапазона id, для которого строки сравниваются напрямую
+        """
+
+        self.source_db = source_db
+        self.reserve_db = reserve_db
+        self.chunk_size = chunk_size
+        self.leaf_size = leaf_size
+
+    def chunk_checksums(self, db, table: str) -> dict:
+        """Контрольные суммы всех диапазонов верхнего уровня одним запросом {номер диапазона: (кол-во, сумма)}"""
+        result = db.execute_query(
+            query=f"SELECT FLOOR(id / %s), COUNT(*), SUM({row_hash(table)}) FROM {table} GROUP BY 1",
+            params=[self.chunk_size]
+        )
+        return {int(item[0]): (item[1], int(item[2] or 0)) for item in result}
+
+    def range_checksum(self, db, table: str, low: int, high: int) -> tuple:
+        """Контрольная сумма диапазона id [low, high)"""
+        result = db.execute_query(
+            query=f"SELECT COUNT(*), COALESCE(SUM({row_hash(table)}), 0) FROM {table} WHERE id >= %s AND id < %s",
+            params=[low, high]
+        )
+        return result[0][0], int(result[0][1])
+
+    def range_rows(self, db, table: str, low: int, high: int) -> dict:
+        """Строки диапазона id [low, high) в виде {id: строка}"""
+        result = db.execute_query(
+            query=f"SELECT {', '.join(migrations.COLUMNS[table])} FROM {table} WHERE id >= %s AND id < %s",
+            params=[low, high]
+        )
+        return {item[0]: tuple(item) for item in result}
+
+    def diff_range(self, table: str, low: int, high: int, report: dict) -> None:
+        """
+        Функция поиска расхождений в диапазоне id делением пополам (спуск только в отличающиеся половины)
+        :param table: Имя таблицы
+        :param low: Начало диапазона (включительно)
+        :param high: Конец диапазона (не включительно)
+        :param report: Отчет {"missing", "extra", "divergent"} (обновляется на месте)
+        :return: None
+        """
+
+        if high - low > self.leaf_size:
+            middle = (low + high) // 2
+            for part_low, part_high in ((low, middle), (middle, high)):
+                source_sum = self.range_checksum(self.source_db, table, part_low, part_high)
+                reserve_sum = self.range_checksum(self.reserve_db, table, part_low, part_high)
+                if source_sum != reserve_sum:
+                    self.diff_range(table, part_low, part_high, report)
+            return
+
+        source_rows = self.range_rows(self.source_db, table, low, high)
+        reserve_rows = self.range_rows(self.reserve_db, table, low, high)
+        for key, row in source_rows.items():
+            if key not in reserve_rows:
+                report['missing'].append(row)
+            elif reserve_rows[key] != row:
+                report['divergent'].append(row)
+        for key, row in reserve_rows.items():
+            if key not in source_rows:
+                report['extra'].append(row)
+
+    def verify_table(self, table: str) -> dict:
+        """
+        Функция сверки таблицы
+        :param table: Имя таблицы
+        :return: Отчет {"missing": [...], "extra": [...], "divergent": [...], "chunks": кол-во отличающихся диапазонов}
+        """
+
+        report = {"missing": [], "extra": [], "divergent": [], "chunks": 0}
+        source_chunks = self.chunk_checksums(self.source_db, table)
+        reserve_chunks = self.chunk_checksums(self.reserve_db, table)
+
+        for number in sorted(set(source_chunks) | set(reserve_chunks)):
+            if source_chunks.get(number) == reserve_chunks.get(number):
+                continue
+            report['chunks'] += 1
+            low = number * self.chunk_size
+            self.diff_range(table, low, low + self.chunk_size, report)
+
+        return report
+
+    def repair_table(self, table: str, report: dict) -> None:
+        """
+        Функция исправления Резервной БД по отчету сверки
+        :param table: Имя таблицы
+        :param report: Отчет verify_table
+        :return: None
+        """
+
+        columns = migrations.COLUMNS[table]
+        rows = report['missing'] + report['divergent']
+        if rows:
+            self.reserve_db.insert_many(table=table, columns=columns, rows=rows, update_columns=columns[1:])
+        if report['extra']:
+            ids = [row[0] for row in report['extra']]
+            self.reserve_db.execute_query(
+                query=f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                params=ids
+            )
+
+
+# Функция сверки Основной и Резервной БД
+def start(tables=migrations.TABLES, repair=False, chunk_size=10000, leaf_size=100) -> dict:
+    """
+    Функция сверки Основной и Резервной БД с выводом отличающихся строк
+    :param tables: Список сверяемых таблиц
+    :param repair: Исправить Резервную БД (дописать недостающие, обновить отличающиеся, удалить лишние строки)
+    :param chunk_size: Размер диапазона id верхнего уровня
+    :param leaf_size: Размер диапазона id, для которого строки сравниваются напрямую
+    :return: Отчеты по таблицам
+    """
+
+    source_db = reserve.connect_main_db()
+    reserve_db = reserve.connect_reserve_db()
+    verifier = Verifier(source_db, reserve_db, chunk_size=chunk_size, leaf_size=leaf_size)
+
+    reports = {}
+    for table in tables:
+        report = verifier.verify_table(table)
+        reports[table] = report
+
+        if not (report['missing'] or report['extra'] or report['divergent']):
+            print(f"✅ {table}: данные совпадают")
+            continue
+
+        print(f"⚠️ {table}: отличающихся диапазонов - {report['chunks']}, "
+              f"нет в резервной БД - {len(report['missing'])}, "
+              f"лишних - {len(report['extra'])}, "
+              f"отличаются - {len(report['divergent'])}")
+        for kind in ("missing", "extra", "divergent"):
+            for row in report[kind]:
+                print(f"\t{kind}: {row}")
+
+        if repair:
+            verifier.repair_table(table, report)
+            print(f"✅ {table}: резервная БД исправлена")
+
+    source_db.close()
+    reserve_db.close()
+    return reports